@@ -1,18 +1,21 @@
-from collections.abc import Generator
-from typing import Annotated, Callable, Optional
+from collections.abc import AsyncGenerator, Generator
+from contextlib import AbstractAsyncContextManager
+from typing import Annotated, Awaitable, Callable, Optional
 
 import jwt
 from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
 from jwt.exceptions import InvalidTokenError
 from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.core import security
 from app.core.config import settings
-from app.core.db import engine
+from app.core.db import async_session, engine
+from app.core.principal_cache import principal_cache
 from app.schemas.search import SearchParams
-from app.schemas.user import UserSchema
+from app.schemas.user import UserPrincipal
 from app.crud.user import user_crud
 from app.schemas.login import TokenPayload
 
@@ -27,65 +30,136 @@ def get_db() -> Generator[Session, None, None]:
         yield session
 
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with async_session() as session:
+        yield session
+
+
+AsyncSessionFactory = Callable[[], AbstractAsyncContextManager[AsyncSession]]
+
+
+def get_async_session_factory() -> AsyncSessionFactory:
+    # For routes running queries concurrently, one session each
+    return async_session
+
+
 SessionDep = Annotated[Session, Depends(get_db)]
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_db)]
+AsyncSessionFactoryDep = Annotated[
+    AsyncSessionFactory, Depends(get_async_session_factory)
+]
 TokenDep = Annotated[str, Depends(reusable_oauth2)]
 
 
-def get_current_user(required: bool) -> Callable[[SessionDep, TokenDep], Optional[UserSchema]]:
-    def _get_current_user(session: SessionDep, token: TokenDep) -> Optional[UserSchema]:
-        if not required and not token:
+def _read_access_token(token: str) -> tuple[str, int]:
+    """
+    Id of the user of an access token and when the token expires.
+    """
+    try:
+        payload = jwt.decode(
+            token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
+        )
+        token_data = TokenPayload(**payload)
+    except (InvalidTokenError, ValidationError):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Could not validate credentials",
+        )
+
+    if payload["type"] != "access_token":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid token type",
+        )
+
+    return token_data.sub, payload["exp"]  # type: ignore
+
+
+def _check_principal(principal: Optional[UserPrincipal]) -> UserPrincipal:
+    if not principal:
+        raise HTTPException(status_code=404, detail="User not found")
+    if not principal.is_verified:
+        raise HTTPException(status_code=400, detail="Not verified user")
+    return principal
+
+
+def _check_token(token: Optional[str], required: bool) -> bool:
+    # Whether there is a token to authenticate with
+    if required and not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated"
+        )
+    return bool(token)
+
+
+def get_current_user(required: bool) -> Callable[[SessionDep, TokenDep], Optional[UserPrincipal]]:
+    def _get_current_user(session: SessionDep, token: TokenDep) -> Optional[UserPrincipal]:
+        if not _check_token(token, required):
             return None
 
-        if required and not token:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Not authenticated"
-            )
-
-        try:
-            payload = jwt.decode(
-                token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
-            )
-            token_data = TokenPayload(**payload)
-        except (InvalidTokenError, ValidationError):
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Could not validate credentials",
-            )
-
-        if payload["type"] != "access_token":
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Invalid token type",
-            )
-
-        user = user_crud.get_by_id(session, token_data.sub)  # type: ignore
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        if not user.is_verified:
-            raise HTTPException(status_code=400, detail="Not verified user")
-        return user
+        principal = principal_cache.get(token)
+        if principal:
+            return principal
+
+        user_id, expires = _read_access_token(token)
+        principal = _check_principal(user_crud.get_principal(session, user_id))  # type: ignore
+        principal_cache.set(token, principal, expires)
+        return principal
 
     return _get_current_user
 
 
+def get_current_user_async(
+    required: bool,
+) -> Callable[[AsyncSessionDep, TokenDep], Awaitable[Optional[UserPrincipal]]]:
+    # Same as get_current_user, for async routes, so they do not wait for
+    # a thread of the threadpool nor a connection of the sync pool
+    async def _get_current_user(
+        session: AsyncSessionDep, token: TokenDep
+    ) -> Optional[UserPrincipal]:
+        if not _check_token(token, required):
+            return None
+
+        principal = principal_cache.get(token)
+        if principal:
+            return principal
+
+        user_id, expires = _read_access_token(token)
+        principal = _check_principal(
+            await session.run_sync(user_crud.get_principal, user_id)  # type: ignore
+        )
+        principal_cache.set(token, principal, expires)
+        return principal
+
+    return _get_current_user
+
+
+# Only what the permission checks need, load the user for anything else
 CurrentUser = Annotated[
-    UserSchema, Depends(get_current_user(required=True))
+    UserPrincipal, Depends(get_current_user(required=True))
 ]
 OptionalCurrentUser = Annotated[
-    Optional[UserSchema], 
+    Optional[UserPrincipal], 
     Depends(get_current_user(required=False))
 ]
+AsyncCurrentUser = Annotated[
+    UserPrincipal, Depends(get_current_user_async(required=True))
+]
+AsyncOptionalCurrentUser = Annotated[
+    Optional[UserPrincipal],
+    Depends(get_current_user_async(required=False))
+]
 
 
-def get_current_active_superuser(current_user: CurrentUser) -> UserSchema:
+def get_current_active_superuser(current_user: CurrentUser) -> UserPrincipal:
     if not current_user or not current_user.is_superuser:
         raise HTTPException(
             status_code=403, detail="The user doesn't have enough privileges"
         )
     return current_user
 
-def get_current_active_author(current_user: CurrentUser) -> UserSchema:
+def get_current_active_author(current_user: CurrentUser) -> UserPrincipal:
     if not current_user or not current_user.author_id:
         raise HTTPException(
             status_code=403, detail="The user doesn't have enough privileges"
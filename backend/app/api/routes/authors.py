@@ -1,11 +1,15 @@
 import uuid
-from typing import Any
+from typing import Any, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, UploadFile
+from pydantic import ValidationError
 from app.core.config import settings
+from app.core.pagination import next_cursor
+from app.core.responses import ModelResponse
 import os
 from app.api.deps import (
-    OptionalCurrentUser,
+    AsyncOptionalCurrentUser,
+    AsyncSessionDep,
     get_current_active_author,
     get_current_active_superuser,
     SessionDep,
@@ -21,7 +25,6 @@ from app.schemas.author import (
     AuthorUpdate,
     AuthorUpdateBasic,
     AuthorsPublicWithPoems,
-    AuthorsPublic,
 )
 from app.crud.author import author_crud
 
@@ -34,22 +37,29 @@ router = APIRouter(prefix="/authors", tags=["authors"])
     dependencies=[Depends(get_current_active_superuser)]
 )
 def read_authors(
-    session: SessionDep, skip: int = 0, limit: int = 100
+    session: SessionDep, skip: int = 0, limit: int = 100, cursor: Optional[str] = None
 ) -> Any:
     """
     Retrieve all authors.
     """
-    params = AuthorSearchParams(
-        author_skip=skip, author_limit=limit
-    )
+    try:
+        params = AuthorSearchParams(
+            author_skip=skip, author_limit=limit, author_cursor=cursor
+        )
+    except ValidationError:
+        raise HTTPException(status_code=400, detail="Invalid pagination parameters")
 
-    authors = [
-        AuthorPublic.model_validate(author)
-        for author in author_crud.get_many(db=session, queryParams=params)
-    ]
-    count = author_crud.get_count(db=session, queryParams=params)
+    authors, count = author_crud.get_many_with_count(
+        db=session, queryParams=params, schema=AuthorPublicWithPoems
+    )
 
-    return AuthorsPublic(data=authors, count=count)
+    return ModelResponse(
+        AuthorsPublicWithPoems(
+            data=authors,
+            count=count,
+            next_cursor=next_cursor(authors, params.cursor_order_by(), params.author_limit),
+        )
+    )
 
 
 @router.post(
@@ -99,13 +109,13 @@ def update_author_me(
 
 
 @router.get("/{author_id}", response_model=AuthorPublicWithPoems)
-def read_author_by_id(
-    author_id: uuid.UUID, session: SessionDep, current_user: OptionalCurrentUser
+async def read_author_by_id(
+    author_id: uuid.UUID, session: AsyncSessionDep, current_user: AsyncOptionalCurrentUser
 ) -> Any:
     """
     Get a specific Author by id.
     """
-    author = author_crud.get_by_id(session, author_id)
+    author = await author_crud.get_by_id_async(session, author_id)
     if not author:
         raise HTTPException(
             status_code=404,
@@ -1,15 +1,19 @@
 import uuid
-from typing import Any
+from typing import Any, Optional
 
 from fastapi import APIRouter, HTTPException, Depends
+from pydantic import ValidationError
 
 from app.api.deps import (
-    OptionalCurrentUser,
+    AsyncOptionalCurrentUser,
+    AsyncSessionDep,
     SessionDep,
     CurrentUser,
     get_current_active_superuser,
 )
 
+from app.core.pagination import next_cursor
+from app.core.responses import ModelResponse
 from app.schemas.common import Message
 from app.schemas.collection import (
     CollectionCreate,
@@ -29,20 +33,29 @@ def read_collections(
     session: SessionDep,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
 ) -> Any:
     """
     Retrieve all Collections.
     """
-    params = CollectionSearchParams(
-        collection_skip=skip, collection_limit=limit
+    try:
+        params = CollectionSearchParams(
+            collection_skip=skip, collection_limit=limit, collection_cursor=cursor
+        )
+    except ValidationError:
+        raise HTTPException(status_code=400, detail="Invalid pagination parameters")
+
+    collections, count = collection_crud.get_many_with_count(
+        session, params, public_restricted=False, schema=CollectionPublicWithPoems
     )
-    collections = [CollectionPublicWithPoems.model_validate(collection) for collection in collection_crud.get_many(
-        session, params, public_restricted=False
-    )]
-    count = collection_crud.get_count(
-        session, params, public_restricted=False)
 
-    return CollectionsPublic(data=collections, count=count)
+    return ModelResponse(
+        CollectionsPublic(
+            data=collections,
+            count=count,
+            next_cursor=next_cursor(collections, params.cursor_order_by(), params.collection_limit),
+        )
+    )
 
 
 @router.post(
@@ -67,13 +80,13 @@ def create_collection(
 
 
 @router.get("/{collection_id}", response_model=CollectionPublicWithPoems)
-def read_collection(
-    collection_id: uuid.UUID, session: SessionDep, current_user: OptionalCurrentUser
+async def read_collection(
+    collection_id: uuid.UUID, session: AsyncSessionDep, current_user: AsyncOptionalCurrentUser
 ) -> Any:
     """
     Get a specific Collection by id.
     """
-    collection = collection_crud.get_by_id(session, collection_id)
+    collection = await collection_crud.get_by_id_async(session, collection_id)
     if not collection:
         raise HTTPException(
             status_code=404,
@@ -7,11 +7,13 @@ from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import HTMLResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import validate_email
+from starlette.concurrency import run_in_threadpool
 
 from app.crud.user import user_crud
 from app.api.deps import CurrentUser, SessionDep, get_current_active_superuser
 from app.core import security
 from app.core.config import settings
+from app.core.password_hasher import password_hasher
 from app.schemas.login import NewPassword, Token, VerifyToken
 from app.schemas.user import UserPublic, UserUpdate
 from app.schemas.common import Message
@@ -27,7 +29,7 @@ router = APIRouter(tags=["login"])
 
 
 @router.post("/login/access-token")
-def login_access_token(
+async def login_access_token(
     session: SessionDep, form_data: Annotated[OAuth2PasswordRequestForm, Depends()]
 ) -> Token:
     """
@@ -38,13 +40,15 @@ def login_access_token(
         validate_email(form_data.username)
 
     except PydanticCustomError:
-        user = user_crud.get_by_username(session, form_data.username)
+        user = await run_in_threadpool(
+            user_crud.get_by_username, session, form_data.username
+        )
         if not user: 
             raise HTTPException(status_code=400, detail="Incorrect email or userame")
         
         user_email = user.email
         
-    user = user_crud.authenticate(
+    user = await user_crud.authenticate(
         db=session, email=user_email, password=form_data.password
     )
     if not user:
@@ -60,11 +64,11 @@ def login_access_token(
 
 
 @router.post("/login/test-token", response_model=UserPublic)
-def test_token(current_user: CurrentUser) -> Any:
+def test_token(session: SessionDep, current_user: CurrentUser) -> Any:
     """
     Test access token
     """
-    return current_user
+    return user_crud.get_by_id(session, current_user.id)
 
 
 @router.post("/password-recovery/{email}")
@@ -92,7 +96,7 @@ def recover_password(email: str, session: SessionDep) -> Message:
 
 
 @router.post("/reset-password/")
-def reset_password(session: SessionDep, body: NewPassword) -> Message:
+async def reset_password(session: SessionDep, body: NewPassword) -> Message:
     """
     Reset password
     """
@@ -100,7 +104,7 @@ def reset_password(session: SessionDep, body: NewPassword) -> Message:
     if not user_id:
         raise HTTPException(status_code=400, detail="Invalid token")
     try:
-        user = user_crud.get_by_id(session, uuid.UUID(user_id))
+        user = await run_in_threadpool(user_crud.get_by_id, session, uuid.UUID(user_id))
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid user id")
     
@@ -113,7 +117,14 @@ def reset_password(session: SessionDep, body: NewPassword) -> Message:
         raise HTTPException(status_code=400, detail="Not verified user")
 
     user_update = UserUpdate(password=body.new_password)
-    user = user_crud.update(db=session, obj_id=user.id, obj_update=user_update)
+    hashed_password = await password_hasher.hash(body.new_password)
+    await run_in_threadpool(
+        user_crud.update,
+        session,
+        user.id,
+        user_update,
+        hashed_password=hashed_password,
+    )
 
     return Message(message="Password updated successfully")
 
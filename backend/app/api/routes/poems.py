@@ -1,20 +1,28 @@
 import uuid
-from typing import Any, Annotated
-from app.schemas.user import UserUpdate
-from fastapi import APIRouter, Depends, HTTPException, Query
+from datetime import datetime, time, timedelta, timezone
+from typing import Any, Annotated, Optional
+from pydantic import ValidationError
+from app.schemas.user import UserPrincipal, UserUpdate
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from starlette.concurrency import run_in_threadpool
 
 from app.api.deps import (
+    AsyncOptionalCurrentUser,
+    AsyncSessionDep,
     CurrentUser,
     OptionalCurrentUser,
     SessionDep,
     get_current_active_superuser,
 )
 
-from app.poem_parser import PoemParser
+from app.core.pagination import next_cursor
+from app.core.responses import ModelResponse
+from app.poem_cache import render_cache
 from app.schemas.author import AuthorCreate
 from app.schemas.poem import (
     PoemCreate,
     PoemRandom,
+    PoemSchema,
     PoemSearchParams,
     PoemUpdate,
     PoemPublicWithAllTheInfo,
@@ -31,36 +39,85 @@ router = APIRouter(prefix="/poems", tags=["poems"])
 
 @router.get("/", response_model=PoemsPublicWithAllTheInfo, dependencies=[Depends(get_current_active_superuser)])
 def read_poems(
-    session: SessionDep, skip: int = 0, limit: int = 100
+    session: SessionDep, skip: int = 0, limit: int = 100, cursor: Optional[str] = None
 ) -> Any:
     """
     Retrieve all poems.
     """
-    params = PoemSearchParams(poem_skip=skip, poem_limit=limit)
-    count = poem_crud.get_count(
-        session, queryParams=params, public_restricted=False
+    try:
+        params = PoemSearchParams(poem_skip=skip, poem_limit=limit, poem_cursor=cursor)
+    except ValidationError:
+        raise HTTPException(status_code=400, detail="Invalid pagination parameters")
+
+    poems, count = poem_crud.get_many_with_count(
+        session, queryParams=params, public_restricted=False, schema=PoemPublicWithAllTheInfo
     )
-    poems = [
-        PoemPublicWithAllTheInfo.model_validate(poem)
-        for poem in poem_crud.get_many(
-            session, queryParams=params, public_restricted=False
-        )
-    ]
 
-    return PoemsPublicWithAllTheInfo(data=poems, count=count)
+    return ModelResponse(
+        PoemsPublicWithAllTheInfo(
+            data=poems,
+            count=count,
+            next_cursor=next_cursor(poems, params.cursor_order_by(), params.poem_limit),
+        )
+    )
 
 
 @router.get("/random", response_model=PoemRandom)
-def read_random_poem(session: SessionDep, current_user: OptionalCurrentUser) -> Any:
+async def read_random_poem(
+    session: AsyncSessionDep, current_user: AsyncOptionalCurrentUser
+) -> Any:
     """
     Get a random poem.
     """
-    poem = poem_crud.get_random(session)
+    poem = await poem_crud.get_random_async(session)
     if not poem:
         raise HTTPException(status_code=404, detail="No poem found")
 
+    poem.rendered_content = await rendered_content_async(poem)
+    return show_random_poem(poem, current_user)
+
+
+@router.get("/daily", response_model=PoemRandom)
+def read_daily_poem(
+    session: SessionDep, current_user: OptionalCurrentUser, response: Response
+) -> Any:
+    """
+    Get the poem of the day.
+    """
+    now = datetime.now(timezone.utc)
+    poem = poem_crud.get_daily(session, now.date())
+    if not poem:
+        raise HTTPException(status_code=404, detail="No poem found")
+
+    # The poem only changes at midnight (UTC)
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), time(), timezone.utc)
+    max_age = int((tomorrow - now).total_seconds())
+    response.headers["Cache-Control"] = f"private, max-age={max_age}"
+
+    return show_random_poem(poem, current_user)
+
+
+def rendered_content(poem: PoemSchema) -> str:
+    # The HTML is stored in the background after every write, render it
+    # here if that has not finished yet
+    if poem.rendered_content is not None:
+        return poem.rendered_content
+
+    return render_cache.render(poem.id, poem.content)
+
+
+async def rendered_content_async(poem: PoemSchema) -> str:
+    # Same as rendered_content, but parsing in a worker thread so the
+    # event loop keeps serving other requests
+    if poem.rendered_content is not None:
+        return poem.rendered_content
+
+    return await run_in_threadpool(render_cache.render, poem.id, poem.content)
+
+
+def show_random_poem(poem: PoemSchema, current_user: Optional[UserPrincipal]) -> PoemSchema:
     if current_user and current_user.is_superuser:
-        poem.content = PoemParser(poem.content).to_html()
+        poem.content = rendered_content(poem)
         return poem
 
     if not poem.show_author and (
@@ -71,28 +128,28 @@ def read_random_poem(session: SessionDep, current_user: OptionalCurrentUser) ->
         poem.author_names = []
         poem.author_ids = []
 
-    poem.content = PoemParser(poem.content).to_html()
+    poem.content = rendered_content(poem)
     return poem
 
 
 @router.get("/{poem_id}", response_model=PoemPublicWithAllTheInfo)
-def read_poem(
-    session: SessionDep,
-    current_user: OptionalCurrentUser,
+async def read_poem(
+    session: AsyncSessionDep,
+    current_user: AsyncOptionalCurrentUser,
     poem_id: uuid.UUID,
     parse: Annotated[bool, Query()] = True,
 ) -> Any:
     """
     Get poem by ID.
     """
-    poem = poem_crud.get_by_id(session, poem_id)
+    poem = await poem_crud.get_by_id_async(session, poem_id)
     if not poem:
         raise HTTPException(status_code=404, detail="Poem not found")
 
     # Return the poem with all the info
     if current_user and current_user.is_superuser:
         if parse:
-            poem.content = PoemParser(poem.content).to_html()
+            poem.content = await rendered_content_async(poem)
 
         return poem
 
@@ -132,7 +189,7 @@ def read_poem(
             derived.author_ids = []
 
     if parse:
-        poem.content = PoemParser(poem.content).to_html()
+        poem.content = await rendered_content_async(poem)
 
     return poem
 
@@ -155,7 +212,8 @@ def create_poem(
             )
 
         if not current_user.author_id:
-            author_in = AuthorCreate(full_name=current_user.username)
+            user = user_crud.get_by_id(session, current_user.id)
+            author_in = AuthorCreate(full_name=user.username)  # type: ignore
             author = author_crud.create(db=session, obj_create=author_in)
             user_crud.update(db=session, obj_id=current_user.id, obj_update=UserUpdate(author_id=author.id))
 
@@ -1,8 +1,12 @@
-from typing import Any
+import asyncio
+from typing import Any, Callable
 
 from fastapi import APIRouter
+from sqlalchemy.orm import Session
 
-from app.api.deps import OptionalCurrentUser, SessionDep
+from app.api.deps import AsyncOptionalCurrentUser, AsyncSessionFactoryDep
+from app.core.pagination import next_cursor
+from app.core.responses import ModelResponse
 from app.schemas.author import AuthorPublic, AuthorPublicBasic, AuthorSearchParams, AuthorsPublic
 from app.schemas.collection import CollectionPublicBasic, CollectionPublicWithPoems, CollectionSearchParams, CollectionsPublic
 from app.schemas.search import SearchParams, SearchResult
@@ -18,7 +22,11 @@ router = APIRouter(prefix="/search", tags=["search"])
 
 
 @router.post("", response_model=SearchResult)
-def search(session: SessionDep, current_user: OptionalCurrentUser, params: SearchParams) -> Any: 
+async def search(
+    session_factory: AsyncSessionFactoryDep,
+    current_user: AsyncOptionalCurrentUser,
+    params: SearchParams,
+) -> Any:
     """
     Universal search
     """
@@ -27,83 +35,101 @@ def search(session: SessionDep, current_user: OptionalCurrentUser, params: Searc
         public_restricted = False
     else: 
         public_restricted = True
-    
+
+    # Each entity is searched on a session of its own, so the searches run
+    # at the same time and take as long as the slowest one
+    async def run(search_entity: Callable[..., Any], *args: Any) -> Any:
+        async with session_factory() as session:
+            return await session.run_sync(search_entity, params, *args)
+
+    searches = {}
     if "author" in params.search_type:
-        if params.author_params is None:
-            authors = author_crud.get_many(session, AuthorSearchParams())
-        else: 
-            authors = author_crud.get_many(session, params.author_params)
-        
-        if params.author_params is None or params.author_params.author_basic: 
-            authors = [AuthorPublicBasic.model_validate(author) for author in authors]
-        else: 
-            author_data = [AuthorPublic.model_validate(author) for author in authors]
-            count = author_crud.get_count(session, params.author_params)
-            authors = AuthorsPublic(data=author_data, count=count)
-    else:
-        authors = []
-        
+        searches["authors"] = run(search_authors)
     if "user" in params.search_type:
-        if params.user_params is None:
-            users = user_crud.get_many(session, UserSearchParams(), public_restricted=public_restricted)
-        else: 
-            users = user_crud.get_many(session, params.user_params, public_restricted=public_restricted)
-        
-        if params.user_params is None or params.user_params.user_basic:
-            users = [UserPublicBasic.model_validate(user) for user in users]
-        else: 
-            user_data = [UserPublic.model_validate(user) for user in users]
-            count = user_crud.get_count(session, params.user_params, public_restricted=public_restricted)
-            users = UsersPublic(data=user_data, count=count)
-            
-    else:
-        users = []
-    
-        
+        searches["users"] = run(search_users, public_restricted)
     if "poem" in params.search_type:
-        if params.poem_params is None:
-            poems = poem_crud.get_many(session, PoemSearchParams(), public_restricted=public_restricted)
-        else: 
-            poems = poem_crud.get_many(session, params.poem_params, public_restricted=public_restricted)
-            
-        if not (current_user and current_user.is_superuser):
-            for poem in poems: 
-                if not poem.show_author:
-                    poem.author_names = []
-                    
-        if params.poem_params is None or params.poem_params.poem_basic:
-            poems = [PoemPublicBasic.model_validate(poem) for poem in poems]
-        else: 
-            poem_data = [PoemPublic.model_validate(poem) for poem in poems]
-            count = poem_crud.get_count(session, params.poem_params, public_restricted=public_restricted)
-            poems = PoemsPublic(data=poem_data, count=count)
-        
-                    
-    else:
-        poems = []
-        
+        searches["poems"] = run(search_poems, public_restricted)
     if "collection" in params.search_type:
-        if params.collection_params is None:
-            collections = collection_crud.get_many(session, CollectionSearchParams(), public_restricted=public_restricted)
-        else: 
-            collections = collection_crud.get_many(session, params.collection_params, public_restricted=public_restricted)
-            
-        if params.collection_params is None or params.collection_params.collection_basic:
-            collections = [CollectionPublicBasic.model_validate(collection) for collection in collections]
-        else: 
-            collection_data = [CollectionPublicWithPoems.model_validate(collection) for collection in collections]
-            count = collection_crud.get_count(session, params.collection_params, public_restricted=public_restricted)
-            collections = CollectionsPublic(data=collection_data, count=count)
-        
-    else:
-        collections = []
-        
-    return SearchResult(
-        authors=authors,
-        users=users,
-        poems=poems,
-        collections=collections
+        searches["collections"] = run(search_collections, public_restricted)
+
+    results = await asyncio.gather(*searches.values())
+    return ModelResponse(SearchResult(**dict(zip(searches.keys(), results))))
+
+
+def search_authors(
+    session: Session, params: SearchParams
+) -> list[AuthorPublicBasic] | AuthorsPublic:
+    if params.author_params is None or params.author_params.author_basic:
+        return author_crud.get_many_basic(session, params.author_params or AuthorSearchParams())
+
+    authors, count = author_crud.get_many_with_count(session, params.author_params, schema=AuthorPublic)
+    return AuthorsPublic(
+        data=authors,
+        count=count,
+        next_cursor=next_cursor(
+            authors, params.author_params.cursor_order_by(), params.author_params.author_limit
+        ),
+    )
+
+
+def search_users(
+    session: Session, params: SearchParams, public_restricted: bool
+) -> list[UserPublicBasic] | UsersPublic:
+    if params.user_params is None or params.user_params.user_basic:
+        return user_crud.get_many_basic(session, params.user_params or UserSearchParams(), public_restricted=public_restricted)
+
+    users, count = user_crud.get_many_with_count(session, params.user_params, public_restricted=public_restricted, schema=UserPublic)
+    return UsersPublic(
+        data=users,
+        count=count,
+        next_cursor=next_cursor(
+            users, params.user_params.cursor_order_by(), params.user_params.user_limit
+        ),
     )
-    
-    
 
+
+def search_poems(
+    session: Session, params: SearchParams, public_restricted: bool
+) -> list[PoemPublicBasic] | PoemsPublic:
+    if params.poem_params is None or params.poem_params.poem_basic:
+        basic_poems = poem_crud.get_many_basic(session, params.poem_params or PoemSearchParams(), public_restricted=public_restricted)
+        if public_restricted:
+            hide_authors(basic_poems)
+        return basic_poems
+
+    poems, count = poem_crud.get_many_with_count(session, params.poem_params, public_restricted=public_restricted, schema=PoemPublic)
+    if public_restricted:
+        hide_authors(poems)
+
+    return PoemsPublic(
+        data=poems,
+        count=count,
+        next_cursor=next_cursor(
+            poems, params.poem_params.cursor_order_by(), params.poem_params.poem_limit
+        ),
+    )
+
+
+def hide_authors(poems: list[PoemPublicBasic] | list[PoemPublic]) -> None:
+    # Only superusers search without restrictions
+    for poem in poems:
+        if not poem.show_author:
+            poem.author_names = []
+
+
+def search_collections(
+    session: Session, params: SearchParams, public_restricted: bool
+) -> list[CollectionPublicBasic] | CollectionsPublic:
+    if params.collection_params is None or params.collection_params.collection_basic:
+        return collection_crud.get_many_basic(session, params.collection_params or CollectionSearchParams(), public_restricted=public_restricted)
+
+    collections, count = collection_crud.get_many_with_count(session, params.collection_params, public_restricted=public_restricted, schema=CollectionPublicWithPoems)
+    return CollectionsPublic(
+        data=collections,
+        count=count,
+        next_cursor=next_cursor(
+            collections,
+            params.collection_params.cursor_order_by(),
+            params.collection_params.collection_limit,
+        ),
+    )
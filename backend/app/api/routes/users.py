@@ -1,9 +1,12 @@
 import uuid
-from typing import Any
+from typing import Any, Optional
 import os
 
+from pydantic import ValidationError
+
 from fastapi import APIRouter, Depends, HTTPException, UploadFile
 from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
 
 from app.crud.user import user_crud
 from app.api.deps import (
@@ -13,7 +16,9 @@ from app.api.deps import (
     get_current_active_superuser,
 )
 from app.core.config import settings
-from app.core.security import verify_password
+from app.core.pagination import next_cursor
+from app.core.responses import ModelResponse
+from app.core.password_hasher import password_hasher
 from app.schemas.common import Message
 from app.schemas.user import (
     EmailToken,
@@ -39,48 +44,63 @@ router = APIRouter(prefix="/users", tags=["users"])
     dependencies=[Depends(get_current_active_superuser)],
     response_model=UsersPublic,
 )
-def read_users(session: SessionDep, skip: int = 0, limit: int = 100) -> Any:
+def read_users(
+    session: SessionDep, skip: int = 0, limit: int = 100, cursor: Optional[str] = None
+) -> Any:
     """
     Retrieve users.
     """
-    params = UserSearchParams(user_skip=skip, user_limit=limit)
-    count = user_crud.get_count(
-        db=session, queryParams=params, public_restricted=False)
-    users = [
-        UserPublic.model_validate(user)
-        for user in user_crud.get_many(db=session, queryParams=params, public_restricted=False)
-    ]
+    try:
+        params = UserSearchParams(user_skip=skip, user_limit=limit, user_cursor=cursor)
+    except ValidationError:
+        raise HTTPException(status_code=400, detail="Invalid pagination parameters")
 
-    return UsersPublic(data=users, count=count)
+    users, count = user_crud.get_many_with_count(
+        db=session, queryParams=params, public_restricted=False, schema=UserPublic
+    )
+
+    return ModelResponse(
+        UsersPublic(
+            data=users,
+            count=count,
+            next_cursor=next_cursor(users, params.cursor_order_by(), params.user_limit),
+        )
+    )
 
 
 @router.post(
     "/", dependencies=[Depends(get_current_active_superuser)], response_model=UserPublic
 )
-def create_user(*, session: SessionDep, user_in: UserCreate) -> Any:
+async def create_user(*, session: SessionDep, user_in: UserCreate) -> Any:
     """
     Create new user.
     """
-    user = user_crud.get_by_email(session, email=user_in.email)
+    user = await run_in_threadpool(user_crud.get_by_email, session, user_in.email)
     if user:
         raise HTTPException(
             status_code=400,
             detail="The user with this email already exists in the system.",
         )
 
-    user = user_crud.get_by_username(session, username=user_in.username)
+    user = await run_in_threadpool(
+        user_crud.get_by_username, session, user_in.username
+    )
     if user:
         raise HTTPException(
             status_code=400,
             detail="The user with this username already exists in the system.",
         )
 
-    user = user_crud.create(db=session, obj_create=user_in)
+    hashed_password = await password_hasher.hash(user_in.password)
+    user = await run_in_threadpool(
+        user_crud.create, session, user_in, hashed_password=hashed_password
+    )
     if settings.emails_enabled and user_in.email:
         email_data = generate_new_account_email(
             email_to=user_in.email, username=user_in.email, password=user_in.password
         )
-        send_email(
+        await run_in_threadpool(
+            send_email,
             email_to=user_in.email,
             subject=email_data.subject,
             html_content=email_data.html_content,
@@ -118,37 +138,47 @@ def update_user_me(
 
 
 @router.patch("/me/password", response_model=Message)
-def update_password_me(
+async def update_password_me(
     *, session: SessionDep, body: UpdatePassword, current_user: CurrentUser
 ) -> Any:
     """
     Update own password.
     """
-    if not verify_password(body.current_password, current_user.hashed_password):
+    user = await run_in_threadpool(user_crud.get_by_id, session, current_user.id)
+    if not user or not await password_hasher.verify(
+        body.current_password, user.hashed_password
+    ):
         raise HTTPException(status_code=400, detail="Incorrect password")
     if body.current_password == body.new_password:
         raise HTTPException(
             status_code=400, detail="New password cannot be the same as the current one"
         )
     user_update = UserUpdate(password=body.new_password)
-    current_user = user_crud.update(
-        db=session, obj_id=current_user.id, obj_update=user_update
-    )  # type: ignore
+    hashed_password = await password_hasher.hash(body.new_password)
+    await run_in_threadpool(
+        user_crud.update,
+        session,
+        current_user.id,
+        user_update,
+        hashed_password=hashed_password,
+    )
     return Message(message="Password updated successfully")
 
 
 @router.post("/me/email", response_model=Message)
-def request_update_email_me(
+async def request_update_email_me(
     *, body: UpdateEmail, current_user: CurrentUser, db: SessionDep
 ) -> Any:
     """
     Update own email.
     """
-    if not verify_password(body.current_password, current_user.hashed_password):
+    user = await run_in_threadpool(user_crud.get_by_id, db, current_user.id)
+    if not user or not await password_hasher.verify(
+        body.current_password, user.hashed_password
+    ):
         raise HTTPException(status_code=400, detail="Incorrect password")
 
-    user = user_crud.get_by_email(db, email=body.new_email)
-    if user:
+    if await run_in_threadpool(user_crud.get_by_email, db, body.new_email):
         raise HTTPException(
             status_code=400, detail="The user with this email already exists in the system"
         )
@@ -158,10 +188,11 @@ def request_update_email_me(
     )
     email_data = generate_email_verification_email(
         email_to=body.new_email,
-        username=current_user.username,
+        username=user.username,
         token=email_token,
     )
-    send_email(
+    await run_in_threadpool(
+        send_email,
         email_to=body.new_email,
         subject=email_data.subject,
         html_content=email_data.html_content,
@@ -246,11 +277,14 @@ def update_user_me_profile_picture(
 
 
 @router.get("/me", response_model=UserPublic)
-def read_user_me(current_user: CurrentUser) -> Any:
+def read_user_me(session: SessionDep, current_user: CurrentUser) -> Any:
     """
     Get current user.
     """
-    return current_user
+    user = user_crud.get_by_id(session, current_user.id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
 
 
 @router.delete("/me", response_model=Message)
@@ -268,18 +302,20 @@ def delete_user_me(session: SessionDep, current_user: CurrentUser) -> Any:
 
 
 @router.post("/signup", response_model=Message)
-def register_user(session: SessionDep, user_in: UserRegister) -> Any:
+async def register_user(session: SessionDep, user_in: UserRegister) -> Any:
     """
     Create new user without the need to be logged in.
     """
-    user = user_crud.get_by_email(session, user_in.email)
+    user = await run_in_threadpool(user_crud.get_by_email, session, user_in.email)
     if user and user.is_verified:
         raise HTTPException(
             status_code=400,
             detail="The user with this email already exists in the system",
         )
     elif user is None:
-        user = user_crud.get_by_username(session, user_in.username)
+        user = await run_in_threadpool(
+            user_crud.get_by_username, session, user_in.username
+        )
         if user:
             raise HTTPException(
                 status_code=400,
@@ -290,14 +326,18 @@ def register_user(session: SessionDep, user_in: UserRegister) -> Any:
         user_create = UserCreate.model_validate(user_data)
         user_create.is_verified = False
 
-        user = user_crud.create(db=session, obj_create=user_create)
+        hashed_password = await password_hasher.hash(user_create.password)
+        user = await run_in_threadpool(
+            user_crud.create, session, user_create, hashed_password=hashed_password
+        )
 
     account_verification_token = generate_temporary_token(
         sub=str(user.id), type="account_verification")
     email_data = generate_account_verification_email(
         email_to=user.email, username=user.username, token=account_verification_token
     )
-    send_email(
+    await run_in_threadpool(
+        send_email,
         email_to=user.email,
         subject=email_data.subject,
         html_content=email_data.html_content,
@@ -318,7 +358,7 @@ def read_user_by_id(
         raise HTTPException(
             status_code=404, detail="The user with this id does not exist in the system"
         )
-    if user == current_user or (current_user and current_user.is_superuser):
+    if current_user and (user.id == current_user.id or current_user.is_superuser):
         return user
 
     user.collections = [
@@ -378,7 +418,7 @@ def update_user_profile_picture(
     dependencies=[Depends(get_current_active_superuser)],
     response_model=UserPublic,
 )
-def update_user(
+async def update_user(
     *,
     session: SessionDep,
     user_id: uuid.UUID,
@@ -388,28 +428,41 @@ def update_user(
     Update a user.
     """
 
-    db_user = user_crud.get_by_id(session, user_id)
+    db_user = await run_in_threadpool(user_crud.get_by_id, session, user_id)
     if not db_user:
         raise HTTPException(
             status_code=404,
             detail="The user with this id does not exist in the system",
         )
     if user_in.email:
-        existing_user = user_crud.get_by_email(session, user_in.email)
+        existing_user = await run_in_threadpool(
+            user_crud.get_by_email, session, user_in.email
+        )
         if existing_user and existing_user.id != user_id:
             raise HTTPException(
                 status_code=409, detail="User with this email already exists"
             )
 
     if user_in.username:
-        existing_user = user_crud.get_by_username(session, user_in.username)
+        existing_user = await run_in_threadpool(
+            user_crud.get_by_username, session, user_in.username
+        )
         if existing_user and existing_user.id != user_id:
             raise HTTPException(
                 status_code=409, detail="User with this username already exists"
             )
 
-    db_user = user_crud.update(
-        db=session, obj_id=db_user.id, obj_update=user_in)
+    hashed_password = None
+    if user_in.password is not None:
+        hashed_password = await password_hasher.hash(user_in.password)
+
+    db_user = await run_in_threadpool(
+        user_crud.update,
+        session,
+        db_user.id,
+        user_in,
+        hashed_password=hashed_password,
+    )
     return db_user
 
 
@@ -423,7 +476,7 @@ def delete_user(
     user = user_crud.get_by_id(session, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    if user == current_user:
+    if user.id == current_user.id:
         raise HTTPException(
             status_code=403, detail="Super users are not allowed to delete themselves"
         )
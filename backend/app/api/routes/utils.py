@@ -1,7 +1,11 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from pydantic.networks import EmailStr
 
-from app.api.deps import get_current_active_superuser
+from app.api.deps import SessionDep, get_current_active_superuser
+from app.bulk_import import BulkImporter, InvalidImport, read_records, read_stream
+from app.core.db import async_pool_stats, pool_stats
+from app.core.password_hasher import password_hasher
+from app.schemas.bulk_import import ImportRecord, ImportResult
 from app.schemas.common import Message
 from app.external.email import generate_test_email, send_email
 
@@ -28,4 +32,49 @@ def test_email(email_to: EmailStr) -> Message:
 
 @router.get("/health-check/")
 async def health_check() -> bool:
-    return True
\ No newline at end of file
+    return True
+
+
+@router.get(
+    "/metrics/",
+    dependencies=[Depends(get_current_active_superuser)],
+)
+def metrics() -> dict[str, dict[str, int | float]]:
+    """
+    Load of the worker and connection pools.
+    """
+    return {
+        "password_hasher": password_hasher.stats(),
+        "db_pool": pool_stats(),
+        "async_db_pool": async_pool_stats(),
+    }
+
+
+@router.post(
+    "/import/",
+    dependencies=[Depends(get_current_active_superuser)],
+)
+def import_data(
+    request: Request,
+    session: SessionDep,
+    chunk_size: int = Query(default=1000, gt=0, le=10000),
+) -> ImportResult:
+    """
+    Bulk import of NDJSON records, see app.bulk_import. Chunks are stored
+    as they are read, so those before an invalid record are kept.
+    """
+    importer = BulkImporter(session)
+    chunk: list[ImportRecord] = []
+    try:
+        for record in read_records(read_stream(request.stream())):
+            chunk.append(record)
+            if len(chunk) == chunk_size:
+                importer.import_chunk(chunk)
+                chunk = []
+
+        if chunk:
+            importer.import_chunk(chunk)
+    except InvalidImport as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return importer.result()
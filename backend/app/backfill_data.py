@@ -0,0 +1,123 @@
+import logging
+
+from sqlalchemy import Column, cast, func, select, text, update
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateColumn, CreateIndex
+
+from app.core.base_class import Base, create_trgm_extension
+from app.core.config import settings
+from app.core.db import engine
+from app.crud.poem import search_config
+from app.models.poem import Poem
+from app.poem_parser import PoemParser, RenderTimeout
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Columns added after the first deployment, in the order they have to be
+# created (generated columns go after the columns they read from).
+ADDED_COLUMNS: list[Column] = [
+    Poem.__table__.c.num_verses,
+    Poem.__table__.c.random_key,
+    Poem.__table__.c.search_config,
+    Poem.__table__.c.search_vector,
+    Poem.__table__.c.content_html,
+]
+
+def add_missing_columns(session: Session) -> None:
+    # create_all only creates missing tables, so columns and indexes added
+    # to existing ones have to be created by hand.
+    dialect = postgresql.dialect()  # type: ignore
+    for column in ADDED_COLUMNS:
+        definition = CreateColumn(column).compile(dialect=dialect)
+        session.execute(
+            text(f"ALTER TABLE {column.table.name} ADD COLUMN IF NOT EXISTS {definition}")
+        )
+
+    session.execute(create_trgm_extension)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            session.execute(CreateIndex(index, if_not_exists=True))
+
+    session.commit()
+
+def backfill_num_verses(session: Session) -> int:
+    # Same as count_verses in app.crud.poem: number of newlines plus one
+    num_verses = (
+        func.length(Poem.content)
+        - func.length(func.replace(Poem.content, "\n", ""))
+        + 1
+    )
+    result = session.execute(
+        update(Poem)
+        .where(Poem.num_verses.is_distinct_from(num_verses))
+        # Keep updated_at, the poems themselves did not change
+        .values(num_verses=num_verses, updated_at=Poem.updated_at)
+    )
+    session.commit()
+
+    return result.rowcount  # type: ignore
+
+def backfill_search_config(session: Session) -> int:
+    count = 0
+    languages = session.scalars(select(Poem.language).distinct()).all()
+    for language in languages:
+        config = search_config(language)
+        result = session.execute(
+            update(Poem)
+            .where(Poem.language.is_not_distinct_from(language))
+            .where(Poem.search_config != cast(config, REGCONFIG))
+            .values(search_config=config, updated_at=Poem.updated_at)
+        )
+        count += result.rowcount  # type: ignore
+
+    session.commit()
+    return count
+
+def backfill_content_html(session: Session, batch_size: int = 500) -> int:
+    # Poems that take too long are left unrendered, so the batches go by id
+    # instead of picking the first unrendered poems again
+    count = 0
+    last_id = None
+    while True:
+        statement = select(Poem.id, Poem.content).where(Poem.content_html.is_(None))
+        if last_id is not None:
+            statement = statement.where(Poem.id > last_id)
+        poems = session.execute(statement.order_by(Poem.id).limit(batch_size)).all()
+        if not poems:
+            return count
+
+        for poem_id, content in poems:
+            parser = PoemParser(content, timeout=settings.POEM_RENDER_BACKGROUND_TIMEOUT)
+            try:
+                html = parser.render()
+            except RenderTimeout:
+                logger.warning(f"Poem {poem_id} took too long to render")
+                continue
+
+            session.execute(
+                update(Poem)
+                .where(Poem.id == poem_id)
+                .values(content_html=html, updated_at=Poem.updated_at)
+            )
+            count += 1
+
+        session.commit()
+        last_id = poems[-1].id
+
+def main() -> None:
+    logger.info("Backfilling poem data")
+    with Session(engine) as session:
+        add_missing_columns(session)
+        count = backfill_num_verses(session)
+        logger.info(f"Updated the verse count of {count} poems")
+        count = backfill_search_config(session)
+        logger.info(f"Updated the search configuration of {count} poems")
+        count = backfill_content_html(session)
+        logger.info(f"Rendered {count} poems")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import argparse
+import json
+import logging
+import math
+import random
+import sys
+import time
+from pathlib import Path
+
+from app.poem_parser import PoemParser
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BASELINE_FILE = Path(__file__).parent / "benchmark_parser_baseline.json"
+
+SONNET = """<center>
+Un soneto me manda hacer **Violante**,
+que en mi vida me he visto en tal aprieto;
+catorce versos dicen que es *soneto*;
+burla burlando van los tres delante.
+2>Yo pensé que no hallara =consonante=,
+y estoy a la mitad de otro cuarteto;
+mas si me veo en el primer terceto,
+no hay cosa en los cuartetos que me espante.
+<right>
+Por el primer terceto voy entrando,
+y parece que entré con pie derecho,//pues fin con este verso le voy dando.
+Ya estoy en el segundo, y aun sospecho
+que voy los trece versos acabando;
+contad si son catorce, y está ~hecho~."""
+
+FUZZ_TOKENS = [
+    "*", "**", "_", "~", "=", "(", ")", "(yellow)", "(12)", "<", ">", "\\",
+    "//", "\n", "\n1>", "\n12>", "<center>", "<right>", "<left>", "verso", " ",
+]
+
+FORMATTED_VERSE = (
+    "**Con** diez *cañones* por _banda_, ~viento~ en =popa=(yellow)"
+    " a =toda= <vela>(20),//no corta el mar"
+)
+
+
+def benchmark_cases(size: int = 1) -> dict[str, str]:
+    """
+    Poems used to time the parser. Size scales the long and adversarial
+    ones, which grow linearly with it.
+    """
+    return {
+        "typical": SONNET,
+        "long": "\n".join([SONNET] * 200 * size),
+        "formatted": "\n".join(
+            f"{i}>{FORMATTED_VERSE}" for i in range(1000 * size)
+        ),
+        "unbalanced_bold": "**a " * 2000 * size,
+        "unbalanced_italic": "*a " * 2000 * size,
+        "unbalanced_underline": "_a " * 2000 * size,
+        "unbalanced_strike": "~a " * 2000 * size,
+        "unbalanced_marks": "=a(" * 2000 * size,
+        "unclosed_colors": "=a=(" * 2000 * size,
+        "repeated_marks": "=a= \\=a= " * 1000 * size,
+        "nested_align": "<center>" * 1000 * size + "verso\n" * 10,
+        "unclosed_right_indent": "<right>\n1>verso\n"
+        + '<div style="padding-left:1ch; margin:0;">' * 1000 * size,
+        "many_cesuras": "\n".join(["verso//verso"] * 2000 * size),
+        "cesuras_in_a_line": "verso//" * 5000 * size,
+        "fuzz": fuzz_case(5000 * size),
+    }
+
+
+def fuzz_case(length: int, seed: int = 0) -> str:
+    """
+    Random markup of the given number of tokens, mixing every construct
+    the parser knows about.
+    """
+    rng = random.Random(seed)
+    return "".join(rng.choice(FUZZ_TOKENS) for _ in range(length))
+
+
+def run_case(content: str, min_rounds: int, min_time: float) -> dict[str, float]:
+    PoemParser(content).to_html()
+
+    timings: list[float] = []
+    start = time.perf_counter()
+    while len(timings) < min_rounds or time.perf_counter() - start < min_time:
+        before = time.perf_counter()
+        PoemParser(content).to_html()
+        timings.append(time.perf_counter() - before)
+
+    timings.sort()
+    p99 = timings[min(len(timings) - 1, math.ceil(len(timings) * 0.99) - 1)]
+    return {"ops_per_sec": len(timings) / sum(timings), "p99_ms": p99 * 1000}
+
+
+def find_regressions(
+    results: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]],
+    tolerance: float,
+) -> list[str]:
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+
+        expected = baseline[name]["ops_per_sec"] * (1 - tolerance)
+        if result["ops_per_sec"] < expected:
+            regressions.append(
+                f"{name}: {result['ops_per_sec']:.1f} ops/sec, "
+                f"baseline {baseline[name]['ops_per_sec']:.1f}"
+            )
+
+    return regressions
+
+
+def find_superlinear(
+    small: dict[str, dict[str, float]],
+    large: dict[str, dict[str, float]],
+    factor: int,
+    margin: float = 2.0,
+) -> list[str]:
+    """
+    Cases whose render time grew more than the input, factor times as
+    large, with a margin for timing noise.
+    """
+    superlinear = []
+    for name, result in large.items():
+        if name not in small:
+            continue
+
+        growth = small[name]["ops_per_sec"] / result["ops_per_sec"]
+        if growth > factor * margin:
+            superlinear.append(f"{name}: {growth:.1f}x slower with {factor}x the input")
+
+    return superlinear
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the poem parser")
+    parser.add_argument(
+        "--save", action="store_true", help="store the results as the new baseline"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.3,
+        help="allowed slowdown against the baseline, as a fraction",
+    )
+    parser.add_argument("--min-rounds", type=int, default=20)
+    parser.add_argument("--min-time", type=float, default=1.0)
+    parser.add_argument(
+        "--scaling",
+        type=int,
+        default=0,
+        metavar="FACTOR",
+        help="also time the cases FACTOR times as large and fail if the render"
+        " time grows faster than the input",
+    )
+    args = parser.parse_args()
+
+    results = {}
+    for name, content in benchmark_cases().items():
+        results[name] = run_case(content, args.min_rounds, args.min_time)
+        logger.info(
+            f"{name:<22} {results[name]['ops_per_sec']:>10.1f} ops/sec"
+            f" {results[name]['p99_ms']:>10.3f} ms p99"
+        )
+
+    if args.scaling:
+        # The typical sonnet does not grow with the size
+        large = {
+            name: run_case(content, args.min_rounds, args.min_time)
+            for name, content in benchmark_cases(size=args.scaling).items()
+            if name != "typical"
+        }
+        superlinear = find_superlinear(results, large, args.scaling)
+        for case in superlinear:
+            logger.error(f"Superlinear render time in {case}")
+        if superlinear:
+            sys.exit(1)
+
+    if args.save:
+        BASELINE_FILE.write_text(json.dumps(results, indent=2) + "\n")
+        logger.info(f"Baseline saved to {BASELINE_FILE}")
+        return
+
+    if not BASELINE_FILE.exists():
+        logger.info("No baseline to compare with, run with --save to create one")
+        return
+
+    baseline = json.loads(BASELINE_FILE.read_text())
+    regressions = find_regressions(results, baseline, args.tolerance)
+    for regression in regressions:
+        logger.error(f"Regression in {regression}")
+
+    if regressions:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
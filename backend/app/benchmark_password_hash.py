@@ -0,0 +1,102 @@
+import argparse
+import logging
+import math
+import time
+
+from passlib.context import CryptContext
+from passlib.exc import MissingBackendError
+
+from app.core.config import settings
+from app.core.security import create_password_context
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PASSWORD = "correct horse battery staple"
+
+
+def profiles(
+    bcrypt_rounds: list[int], argon2_time_costs: list[int]
+) -> dict[str, CryptContext]:
+    """
+    Password contexts to time, one per cost setting of each scheme. The
+    argon2 ones use the memory cost and parallelism of the settings.
+    """
+    contexts = {}
+    for rounds in bcrypt_rounds:
+        contexts[f"bcrypt rounds={rounds}"] = create_password_context(
+            "bcrypt", bcrypt_rounds=rounds
+        )
+    for time_cost in argon2_time_costs:
+        contexts[
+            f"argon2 t={time_cost} m={settings.PASSWORD_ARGON2_MEMORY_COST}"
+            f" p={settings.PASSWORD_ARGON2_PARALLELISM}"
+        ] = create_password_context("argon2", argon2_time_cost=time_cost)
+
+    return contexts
+
+
+def current_profile() -> str:
+    if settings.PASSWORD_HASH_SCHEME == "bcrypt":
+        return f"bcrypt rounds={settings.PASSWORD_BCRYPT_ROUNDS}"
+
+    return (
+        f"argon2 t={settings.PASSWORD_ARGON2_TIME_COST}"
+        f" m={settings.PASSWORD_ARGON2_MEMORY_COST}"
+        f" p={settings.PASSWORD_ARGON2_PARALLELISM}"
+    )
+
+
+def run_profile(context: CryptContext, rounds: int) -> dict[str, float]:
+    # Verifying hashes the password again, and it is what a login waits for
+    timings: list[float] = []
+    hashed = context.hash(PASSWORD)
+    for _ in range(rounds):
+        before = time.perf_counter()
+        context.verify(PASSWORD, hashed)
+        timings.append(time.perf_counter() - before)
+
+    timings.sort()
+    p99 = timings[min(len(timings) - 1, math.ceil(len(timings) * 0.99) - 1)]
+    return {
+        "mean_ms": sum(timings) / len(timings) * 1000,
+        "p99_ms": p99 * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Time password verification for each hashing cost"
+    )
+    parser.add_argument(
+        "--bcrypt-rounds", type=int, nargs="*", default=[10, 11, 12, 13, 14]
+    )
+    parser.add_argument("--argon2-time-cost", type=int, nargs="*", default=[1, 2, 3, 4])
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument(
+        "--slo-ms",
+        type=float,
+        default=None,
+        help="flag the settings whose p99 is above this latency",
+    )
+    args = parser.parse_args()
+
+    current = current_profile()
+    for name, context in profiles(args.bcrypt_rounds, args.argon2_time_cost).items():
+        try:
+            result = run_profile(context, args.rounds)
+        except MissingBackendError:
+            logger.info(f"{name:<32} skipped, the scheme is not installed")
+            continue
+
+        over_slo = args.slo_ms is not None and result["p99_ms"] > args.slo_ms
+        logger.info(
+            f"{name:<32} {result['mean_ms']:>10.1f} ms mean"
+            f" {result['p99_ms']:>10.1f} ms p99"
+            f"{'  over SLO' if over_slo else ''}"
+            f"{'  (current)' if name == current else ''}"
+        )
+
+if __name__ == "__main__":
+    main()
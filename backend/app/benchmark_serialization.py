@@ -0,0 +1,160 @@
+import argparse
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from pydantic import BaseModel
+
+from app.core.responses import ModelResponse
+from app.models.author import Author
+from app.models.collection import Collection
+from app.models.poem import Poem, Poem_Poem
+from app.models.user import User
+from app.schemas.author import AuthorPublicWithPoems, AuthorSchema, AuthorsPublicWithPoems
+from app.schemas.collection import (
+    CollectionPublicWithPoems,
+    CollectionSchema,
+    CollectionsPublic,
+)
+from app.schemas.poem import PoemPublicWithAllTheInfo, PoemSchema, PoemsPublicWithAllTheInfo
+from app.schemas.user import UserPublic, UserSchema, UsersPublic
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Schema the CRUD used to return, the response DTO and the page of the list
+# endpoint
+ENDPOINTS: dict[str, tuple[type[BaseModel], type[BaseModel], type[BaseModel]]] = {
+    "poems": (PoemSchema, PoemPublicWithAllTheInfo, PoemsPublicWithAllTheInfo),
+    "authors": (AuthorSchema, AuthorPublicWithPoems, AuthorsPublicWithPoems),
+    "collections": (CollectionSchema, CollectionPublicWithPoems, CollectionsPublic),
+    "users": (UserSchema, UserPublic, UsersPublic),
+}
+
+
+def sample_rows(size: int = 100) -> dict[str, list[Any]]:
+    """
+    Pages of size ORM objects for each endpoint, with their relationships
+    set as the CRUD loads them. Nothing is stored, so only the CPU spent on
+    serializing them is timed.
+    """
+    now = datetime.now(timezone.utc)
+    authors = [
+        Author(id=uuid.uuid4(), full_name=f"Author {i}", birth_date=now)
+        for i in range(size)
+    ]
+    poems = []
+    for i in range(size):
+        poem = Poem(
+            id=uuid.uuid4(),
+            title=f"Poem {i}",
+            content="Verse\n" * 14,
+            is_public=True,
+            show_author=True,
+            language="es",
+            created_at=now,
+            updated_at=now,
+            authors=authors[i : i + 2],
+        )
+        if i % 4:
+            Poem_Poem(original_poem=poems[i - i % 4], derived_poem=poem, type=i % 2)
+        poems.append(poem)
+
+    users = []
+    collections = []
+    for i in range(size):
+        user = User(
+            id=uuid.uuid4(),
+            email=f"user{i}@example.com",
+            hashed_password="hash",
+            username=f"user{i}",
+            is_verified=True,
+            is_superuser=False,
+            created_at=now,
+            author=authors[i],
+        )
+        collection = Collection(
+            id=uuid.uuid4(),
+            name=f"Collection {i}",
+            is_public=True,
+            created_at=now,
+            updated_at=now,
+            user_id=user.id,
+            user=user,
+            poems=poems[i : i + 10],
+        )
+        users.append(user)
+        collections.append(collection)
+
+    return {"poems": poems, "authors": authors, "collections": collections, "users": users}
+
+
+def serialize_twice(
+    rows: list[Any],
+    schema: type[BaseModel],
+    dto: type[BaseModel],
+    page: type[BaseModel],
+    loop: asyncio.AbstractEventLoop,
+) -> bytes:
+    # Into the CRUD schema, into the DTO, and through the response_model
+    items = [dto.model_validate(schema.model_validate(row)) for row in rows]
+    field = create_model_field(f"Response_{page.__name__}", page, mode="serialization")
+    content = loop.run_until_complete(
+        serialize_response(field=field, response_content=page(data=items, count=len(items)))
+    )
+    return bytes(JSONResponse(content).body)
+
+
+def serialize_once(rows: list[Any], dto: type[BaseModel], page: type[BaseModel]) -> bytes:
+    items = [dto.model_validate(row) for row in rows]
+    return bytes(ModelResponse(page(data=items, count=len(items))).body)
+
+
+def run_endpoint(name: str, rows: list[Any], rounds: int) -> dict[str, float]:
+    schema, dto, page = ENDPOINTS[name]
+    loop = asyncio.new_event_loop()
+    try:
+        timings = {"before_ms": 0.0, "after_ms": 0.0}
+        for _ in range(rounds):
+            before = time.process_time()
+            serialize_twice(rows, schema, dto, page, loop)
+            timings["before_ms"] += time.process_time() - before
+
+            before = time.process_time()
+            serialize_once(rows, dto, page)
+            timings["after_ms"] += time.process_time() - before
+    finally:
+        loop.close()
+
+    result = {key: value / rounds * 1000 for key, value in timings.items()}
+    result["saved"] = 1 - result["after_ms"] / result["before_ms"] if result["before_ms"] else 0
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="CPU time to serialize a page of each list endpoint, before"
+        " and after validating straight into the response DTO"
+    )
+    parser.add_argument("--size", type=int, default=100, help="items per page")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = sample_rows(args.size)
+    for name in ENDPOINTS:
+        result = run_endpoint(name, rows[name], args.rounds)
+        logger.info(
+            f"{name:<12} {result['before_ms']:>8.2f} ms before"
+            f" {result['after_ms']:>8.2f} ms after"
+            f" {result['saved']:>6.0%} saved"
+        )
+
+if __name__ == "__main__":
+    main()
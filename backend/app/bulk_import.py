@@ -0,0 +1,351 @@
+import argparse
+import logging
+import sys
+import time
+import uuid
+from collections.abc import AsyncIterator, Iterable, Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Any, Optional
+
+from anyio import from_thread
+from pydantic import ValidationError
+from sqlalchemy import Row, Table, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.db import engine
+from app.core.security import get_password_hash
+from app.crud.poem import count_verses, search_config
+from app.models.author import Author, author_poem
+from app.models.collection import Collection, collection_poem
+from app.models.poem import Poem, Poem_Poem
+from app.models.user import User
+from app.render_queue import render_queue
+from app.schemas.bulk_import import (
+    AuthorImport,
+    CollectionImport,
+    ImportRecord,
+    ImportResult,
+    PoemImport,
+    UserImport,
+    import_record_adapter,
+    import_records_adapter,
+)
+
+
+logger = logging.getLogger(__name__)
+
+TABLES: list[Table] = [
+    Author.__table__,  # type: ignore
+    User.__table__,  # type: ignore
+    Poem.__table__,  # type: ignore
+    author_poem,
+    Poem_Poem.__table__,  # type: ignore
+    Collection.__table__,  # type: ignore
+    collection_poem,
+]
+
+
+class InvalidImport(ValueError):
+    pass
+
+
+def parse_line(line: bytes, number: int) -> Optional[ImportRecord]:
+    if not line.strip():
+        return None
+
+    try:
+        return import_record_adapter.validate_json(line)
+    except ValidationError as e:
+        raise InvalidImport(f"Invalid record on line {number}: {error_message(e)}")
+
+
+def parse_array(data: bytes) -> list[ImportRecord]:
+    try:
+        return import_records_adapter.validate_json(data)
+    except ValidationError as e:
+        raise InvalidImport(f"Invalid records: {error_message(e)}")
+
+
+def error_message(e: ValidationError) -> str:
+    error = e.errors()[0]
+    location = ".".join(str(part) for part in error["loc"])
+    return f"{location}: {error['msg']}" if location else error["msg"]
+
+
+def read_records(lines: Iterable[bytes]) -> Iterator[ImportRecord]:
+    """
+    Records of NDJSON input, parsed as they are read. Input starting with
+    "[" is a JSON array, which is read whole.
+    """
+    lines = iter(lines)
+    for number, line in enumerate(lines, 1):
+        if line.lstrip().startswith(b"["):
+            yield from parse_array(line + b"".join(lines))
+            return
+
+        record = parse_line(line, number)
+        if record is not None:
+            yield record
+
+
+def read_stream(stream: AsyncIterator[bytes]) -> Iterator[bytes]:
+    """
+    Lines of a request body, for handlers that run on a worker thread. The
+    body is received on the event loop, the lines are split on the thread.
+    """
+
+    async def receive() -> Optional[bytes]:
+        return await anext(stream, None)
+
+    buffer = b""
+    while (data := from_thread.run(receive)) is not None:
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line + b"\n"
+
+    if buffer:
+        yield buffer
+
+
+class BulkImporter:
+    """
+    Imports records chunk by chunk, each chunk in a transaction of its own
+    with a multi-row insert per table. The authors, users, poems and
+    collections of a chunk are inserted in that order, so records can refer
+    to those of earlier chunks and to those of earlier entities in their
+    own. Rows that already exist are left as they are, and records that
+    refer to missing rows are skipped. The inserted poems are rendered by
+    app.render_queue once their chunk is committed.
+    """
+
+    def __init__(self, session: Session) -> None:
+        self.session = session
+        self.rows = {table.name: 0 for table in TABLES}
+        self.skipped = 0
+        self.start = time.perf_counter()
+
+    def import_chunk(self, records: Sequence[ImportRecord]) -> None:
+        rows, skipped = dict(self.rows), self.skipped
+        self.unrendered: list[tuple[uuid.UUID, str]] = []
+        try:
+            self.import_authors([r for r in records if isinstance(r, AuthorImport)])
+            self.import_users([r for r in records if isinstance(r, UserImport)])
+            self.import_poems([r for r in records if isinstance(r, PoemImport)])
+            self.import_collections(
+                [r for r in records if isinstance(r, CollectionImport)]
+            )
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            self.rows, self.skipped = rows, skipped
+            raise
+
+        for poem_id, content in self.unrendered:
+            render_queue.submit(poem_id, content)
+
+    def import_authors(self, authors: list[AuthorImport]) -> None:
+        self.insert(
+            Author.__table__,  # type: ignore
+            [author.model_dump(exclude={"entity"}) for author in authors],
+            records=True,
+        )
+
+    def import_users(self, users: list[UserImport]) -> None:
+        author_ids = self.author_ids({u.author_name for u in users if u.author_name})
+        users = self.keep(
+            users, lambda user: not user.author_name or user.author_name in author_ids
+        )
+
+        # bcrypt releases the GIL, so the passwords are hashed in parallel
+        passwords = [user.password for user in users if user.hashed_password is None]
+        with ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS) as pool:
+            hashes = iter(pool.map(get_password_hash, passwords))
+
+        rows = []
+        for user in users:
+            row = user.model_dump(exclude={"entity", "password", "author_name"})
+            if user.hashed_password is None:
+                row["hashed_password"] = next(hashes)
+            row["author_id"] = author_ids.get(user.author_name)  # type: ignore
+            rows.append(row)
+
+        self.insert(User.__table__, rows, records=True)  # type: ignore
+
+    def import_poems(self, poems: list[PoemImport]) -> None:
+        author_ids = self.author_ids(
+            {name for poem in poems for name in poem.author_names or []}
+        )
+        existing = self.existing_ids(
+            Poem, {p.original_poem_id for p in poems if p.original_poem_id}
+        )
+        poems = self.keep(
+            poems,
+            lambda poem: all(name in author_ids for name in poem.author_names or []),
+        )
+
+        # Poems derived from skipped ones are skipped too, and so on down
+        # the chain of derived poems
+        while True:
+            originals = existing | {poem.id for poem in poems}
+            kept = self.keep(
+                poems,
+                lambda poem: poem.original_poem_id is None
+                or poem.original_poem_id in originals,
+            )
+            if len(kept) == len(poems):
+                break
+            poems = kept
+
+        rows = []
+        for poem in poems:
+            row = poem.model_dump(
+                exclude={"entity", "author_names", "type", "original_poem_id"}
+            )
+            row["num_verses"] = count_verses(poem.content)
+            row["search_config"] = search_config(poem.language)
+            rows.append(row)
+
+        inserted = self.insert(Poem.__table__, rows, records=True)  # type: ignore
+        poems = [poem for poem in poems if poem.id in inserted]
+        self.unrendered.extend((poem.id, poem.content) for poem in poems)
+        self.insert(
+            author_poem,
+            [
+                {"poem_id": poem.id, "author_id": author_ids[name]}
+                for poem in poems
+                for name in poem.author_names or []
+            ],
+        )
+        self.insert(
+            Poem_Poem.__table__,  # type: ignore
+            [
+                {
+                    "original_poem_id": poem.original_poem_id,
+                    "derived_poem_id": poem.id,
+                    "type": poem.type,
+                }
+                for poem in poems
+                if poem.type is not None and poem.original_poem_id
+            ],
+        )
+
+    def import_collections(self, collections: list[CollectionImport]) -> None:
+        user_ids = self.existing_ids(User, {c.user_id for c in collections})
+        poem_ids = self.existing_ids(
+            Poem, {poem_id for c in collections for poem_id in c.poem_ids}
+        )
+        collections = self.keep(
+            collections,
+            lambda collection: collection.user_id in user_ids
+            and all(poem_id in poem_ids for poem_id in collection.poem_ids),
+        )
+
+        inserted = self.insert(
+            Collection.__table__,  # type: ignore
+            [c.model_dump(exclude={"entity", "poem_ids"}) for c in collections],
+            records=True,
+        )
+        self.insert(
+            collection_poem,
+            [
+                {"collection_id": collection.id, "poem_id": poem_id}
+                for collection in collections
+                if collection.id in inserted
+                for poem_id in set(collection.poem_ids)
+            ],
+        )
+
+    def insert(
+        self, table: Table, rows: list[dict[str, Any]], records: bool = False
+    ) -> set[uuid.UUID]:
+        """
+        Inserts the rows that do not exist yet and returns the first
+        primary key column of those inserted. Existing rows of records
+        count as skipped.
+        """
+        if not rows:
+            return set()
+
+        result = self.session.execute(
+            insert(table).on_conflict_do_nothing().returning(*table.primary_key.columns),
+            rows,
+        )
+        inserted: list[Row] = result.all()  # type: ignore
+        self.rows[table.name] += len(inserted)
+        if records:
+            self.skipped += len(rows) - len(inserted)
+        return {row[0] for row in inserted}
+
+    def keep(self, records: list[Any], condition: Any) -> list[Any]:
+        kept = [record for record in records if condition(record)]
+        self.skipped += len(records) - len(kept)
+        return kept
+
+    def author_ids(self, names: set[str]) -> dict[str, uuid.UUID]:
+        if not names:
+            return {}
+
+        statement = select(Author.full_name, Author.id).where(Author.full_name.in_(names))
+        return dict(self.session.execute(statement).tuples().all())
+
+    def existing_ids(self, model: Any, ids: set[uuid.UUID]) -> set[uuid.UUID]:
+        if not ids:
+            return set()
+
+        return set(self.session.scalars(select(model.id).where(model.id.in_(ids))))
+
+    def result(self) -> ImportResult:
+        seconds = time.perf_counter() - self.start
+        return ImportResult(
+            rows=dict(self.rows),
+            skipped=self.skipped,
+            seconds=seconds,
+            rows_per_second=sum(self.rows.values()) / seconds if seconds else 0,
+        )
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(
+        description="Import authors, users, poems and collections"
+    )
+    parser.add_argument("path", help="NDJSON or JSON file, - to read from stdin")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    file = nullcontext(sys.stdin.buffer) if args.path == "-" else open(args.path, "rb")
+    with file as lines, Session(engine) as session:
+        importer = BulkImporter(session)
+        chunk: list[ImportRecord] = []
+        for record in read_records(lines):
+            chunk.append(record)
+            if len(chunk) == args.chunk_size:
+                importer.import_chunk(chunk)
+                chunk = []
+                result = importer.result()
+                logger.info(
+                    f"{sum(result.rows.values())} rows,"
+                    f" {result.rows_per_second:.0f} rows/sec"
+                )
+
+        if chunk:
+            importer.import_chunk(chunk)
+
+    result = importer.result()
+    for table, count in result.rows.items():
+        logger.info(f"{table:<16} {count:>10} rows")
+    logger.info(
+        f"Imported {sum(result.rows.values())} rows in {result.seconds:.1f}s"
+        f" ({result.rows_per_second:.0f} rows/sec), skipped {result.skipped} records"
+    )
+    logger.info("Waiting for the imported poems to render")
+    start = time.perf_counter()
+    render_queue.shutdown()
+    logger.info(f"Rendered the imported poems in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
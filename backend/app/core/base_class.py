@@ -1,3 +1,8 @@
+from sqlalchemy import DDL, event
 from sqlalchemy.orm import declarative_base
 
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
+
+# The trigram indexes used for substring search need pg_trgm
+create_trgm_extension = DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+event.listen(Base.metadata, "before_create", create_trgm_extension)
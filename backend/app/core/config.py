@@ -35,6 +35,24 @@ class Settings(BaseSettings):
     SECRET_KEY: str = secrets.token_urlsafe(32)
     # 60 minutes * 24 hours * 8 days = 8 days
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8
+    # Seconds an authenticated user is kept in memory between requests
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    PRINCIPAL_CACHE_SIZE: int = 4096
+    # Threads hashing and verifying passwords, and the number of jobs that
+    # can wait for them before new logins are turned away
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    # Scheme and cost of new password hashes. Hashes made with the other
+    # scheme or other costs are replaced on the next login. argon2 needs
+    # the argon2-cffi package.
+    PASSWORD_HASH_SCHEME: Literal["bcrypt", "argon2"] = "bcrypt"
+    PASSWORD_BCRYPT_ROUNDS: int = 12
+    PASSWORD_ARGON2_TIME_COST: int = 2
+    # KiB of memory used by each hash
+    PASSWORD_ARGON2_MEMORY_COST: int = 102400
+    PASSWORD_ARGON2_PARALLELISM: int = 8
+    # Encoder of the JSON responses, json is the standard library one
+    JSON_RESPONSE_ENCODER: Literal["orjson", "json"] = "orjson"
     FRONTEND_HOST: str = "http://localhost:5173"
     ENVIRONMENT: Literal["local", "staging", "production"] = "local"
     IMAGES_DIR: str
@@ -71,6 +89,18 @@ class Settings(BaseSettings):
             path=self.POSTGRES_DB,
         )  # type: ignore
 
+    # Connections kept open by each worker, extra ones opened under load
+    # and seconds a request waits for one before failing
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    # Seconds after which connections are replaced, -1 to keep them
+    DB_POOL_RECYCLE: int = 1800
+    # Check connections before using them, to skip those the server closed
+    DB_POOL_PRE_PING: bool = True
+    # Milliseconds a statement can run before it is cancelled, 0 for no limit
+    DB_STATEMENT_TIMEOUT_MS: int = 30000
+
     # TODO: check this
 
     @computed_field  # type: ignore[prop-decorator]
@@ -101,6 +131,16 @@ class Settings(BaseSettings):
             self.EMAILS_FROM_NAME = self.PROJECT_NAME
         return self
 
+    # Number of rendered poems kept in memory by each worker
+    POEM_RENDER_CACHE_SIZE: int = 1024
+    # Seconds a poem can take to render before falling back to plain text
+    POEM_RENDER_TIMEOUT: float = 1.0
+    # Seconds a poem can take to render in the background and in the
+    # backfill. The HTML of poems that take longer is not stored.
+    POEM_RENDER_BACKGROUND_TIMEOUT: float = 30.0
+    # Threads rendering poems in the background after they are written
+    POEM_RENDER_WORKERS: int = 2
+
     EMAIL_RESET_TOKEN_EXPIRE_HOURS: int = 48
     EMAIL_VERIFICATION_TOKEN_EXPIRE_HOURS: int = 48
 
@@ -1,18 +1,62 @@
 from app.core.config import settings
 
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session
 
 from app.crud.user import user_crud
 from app.schemas.user import UserCreate
 from app.core.base_class import Base
+from app.core.pool_metrics import MeteredAsyncQueuePool, MeteredQueuePool
+from app.core.query_stats import track_queries
+from app.core.security import get_password_hash
 
 import app.models.user
 import app.models.author
 import app.models.poem
 import app.models.collection
 
-engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+engine_options = dict(
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    connect_args={"options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"},
+)
+
+engine = create_engine(
+    str(settings.SQLALCHEMY_DATABASE_URI),
+    poolclass=MeteredQueuePool,
+    **engine_options,  # type: ignore
+)
+
+# Used by the async routes, which read without taking a worker thread. Each
+# of the engines has a pool of its own.
+async_engine = create_async_engine(
+    str(settings.SQLALCHEMY_DATABASE_URI),
+    poolclass=MeteredAsyncQueuePool,
+    **engine_options,  # type: ignore
+)
+
+async_session = async_sessionmaker(async_engine)
+
+# Statements of each request, reported in its headers outside production
+if settings.ENVIRONMENT != "production":
+    track_queries(engine)
+    track_queries(async_engine.sync_engine)
+
+
+def pool_stats() -> dict[str, int | float]:
+    return MeteredQueuePool.metrics.stats(
+        engine.pool, settings.DB_MAX_OVERFLOW  # type: ignore
+    )
+
+
+def async_pool_stats() -> dict[str, int | float]:
+    return MeteredAsyncQueuePool.metrics.stats(
+        async_engine.pool, settings.DB_MAX_OVERFLOW  # type: ignore
+    )
 
 
 def create_db_and_tables():
@@ -29,4 +73,8 @@ def init_db(session: Session):
             is_superuser=True,
             is_verified=True,
         )
-        user = user_crud.create(db=session, obj_create=user_in)
+        user = user_crud.create(
+            db=session,
+            obj_create=user_in,
+            hashed_password=get_password_hash(user_in.password),
+        )
@@ -0,0 +1,84 @@
+import base64
+import binascii
+import json
+import uuid
+from datetime import datetime
+from typing import Any, Optional, Sequence
+
+from sqlalchemy import ColumnElement, and_, or_
+
+
+def encode_cursor(order_by: str, value: Any, obj_id: uuid.UUID) -> str:
+    if isinstance(value, datetime):
+        value = {"datetime": value.isoformat()}
+
+    data = json.dumps({"order_by": order_by, "value": value, "id": str(obj_id)})
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+# Type of the values of each column results can be ordered by with a
+# cursor. Any of them can be null.
+CURSOR_VALUE_TYPES: dict[str, type] = {
+    "title": str,
+    "name": str,
+    "full_name": str,
+    "username": str,
+    "email": str,
+    "created_at": datetime,
+    "updated_at": datetime,
+    "birth_date": datetime,
+    "death_date": datetime,
+}
+
+
+def decode_cursor(cursor: str, order_by: str) -> tuple[Any, uuid.UUID]:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        cursor_order_by = data["order_by"]
+        value = data["value"]
+        if isinstance(value, dict):
+            value = datetime.fromisoformat(value["datetime"])
+
+        if value is not None and not isinstance(value, CURSOR_VALUE_TYPES[order_by]):
+            raise TypeError(f"The value is not a {order_by}")
+        if not isinstance(data["id"], str):
+            raise TypeError("The id is not a string")
+        obj_id = uuid.UUID(data["id"])
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise ValueError("Invalid cursor")
+
+    if cursor_order_by != order_by:
+        raise ValueError("The cursor was created for a different order")
+
+    return value, obj_id
+
+
+def next_cursor(
+    items: Sequence[Any], order_by: Optional[str], limit: int
+) -> Optional[str]:
+    if order_by is None or len(items) < limit:
+        return None
+
+    last = items[-1]
+    return encode_cursor(order_by, getattr(last, order_by), last.id)
+
+
+def keyset_filter(
+    column: Any, id_column: Any, cursor: str, order_by: str, desc: bool
+) -> ColumnElement[bool]:
+    """
+    Rows that come after the cursor when ordering by the column (nulls
+    first ascending, nulls last descending) and then by ascending id.
+    """
+    value, obj_id = decode_cursor(cursor, order_by)
+
+    if value is None:
+        same_value = and_(column.is_(None), id_column > obj_id)
+        return same_value if desc else or_(same_value, column.is_not(None))
+
+    after = column < value if desc else column > value
+    filters = [after, and_(column == value, id_column > obj_id)]
+    if desc:
+        filters.append(column.is_(None))
+
+    return or_(*filters)
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+from app.core.config import settings
+from app.core.security import (
+    get_password_hash,
+    verify_and_update_password,
+    verify_password,
+)
+
+
+T = TypeVar("T")
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    """
+    Hashes and verifies passwords on a thread pool of its own, so a burst of
+    logins waits for these threads instead of taking the event loop and the
+    threads serving every other request. At most max_pending jobs can be
+    queued or running at once, further ones raise PasswordHasherBusy.
+    """
+
+    def __init__(self, workers: int, max_pending: int) -> None:
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="password-hash"
+        )
+        self.workers = workers
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    async def verify_and_update(
+        self, plain_password: str, hashed_password: str
+    ) -> tuple[bool, Optional[str]]:
+        return await self._run(
+            verify_and_update_password, plain_password, hashed_password
+        )
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "queued": self._queued,
+                "running": self._running,
+                "completed": self._completed,
+                "rejected": self._rejected,
+            }
+
+    async def _run(self, fn: Callable[..., T], *args: Any) -> T:
+        with self._lock:
+            if self._queued + self._running >= self.max_pending:
+                self._rejected += 1
+                raise PasswordHasherBusy()
+            self._queued += 1
+
+        future = self.executor.submit(self._call, fn, *args)
+        future.add_done_callback(self._cancelled)
+        return await asyncio.wrap_future(future)
+
+    def _call(self, fn: Callable[..., T], *args: Any) -> T:
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+
+    def _cancelled(self, future: Future[Any]) -> None:
+        # Jobs cancelled before starting (the request went away) never
+        # reach _call, so they leave the queue here
+        if future.cancelled():
+            with self._lock:
+                self._queued -= 1
+
+
+password_hasher = PasswordHasher(
+    settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_PENDING
+)
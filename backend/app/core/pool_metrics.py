@@ -0,0 +1,78 @@
+import math
+import threading
+import time
+from collections import deque
+
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry, QueuePool
+
+
+class PoolMetrics:
+    """
+    How long requests wait to check out a database connection, over the
+    last window checkouts, and how many gave up waiting.
+    """
+
+    def __init__(self, window: int = 1024) -> None:
+        self._lock = threading.Lock()
+        self._waits: deque[float] = deque(maxlen=window)
+        self._checkouts = 0
+        self._timeouts = 0
+
+    def record_checkout(self, wait: float) -> None:
+        with self._lock:
+            self._waits.append(wait)
+            self._checkouts += 1
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self._timeouts += 1
+
+    def stats(self, pool: QueuePool, max_overflow: int) -> dict[str, int | float]:
+        with self._lock:
+            waits = sorted(self._waits)
+            checkouts = self._checkouts
+            timeouts = self._timeouts
+
+        capacity = pool.size() + max_overflow
+        p99 = waits[min(len(waits) - 1, math.ceil(len(waits) * 0.99) - 1)] if waits else 0
+        return {
+            "size": pool.size(),
+            "max_overflow": max_overflow,
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+            "saturation": pool.checkedout() / capacity if capacity else 0,
+            "checkouts": checkouts,
+            "timeouts": timeouts,
+            "wait_mean_ms": sum(waits) / len(waits) * 1000 if waits else 0,
+            "wait_p99_ms": p99 * 1000,
+            "wait_max_ms": waits[-1] * 1000 if waits else 0,
+        }
+
+
+class MeteredPool:
+    """
+    Records checkout waits of a queue pool in its class metrics, which are
+    kept outside the pool so they survive it being recreated.
+    """
+
+    metrics: PoolMetrics
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()  # type: ignore[misc]
+        except TimeoutError:
+            self.metrics.record_timeout()
+            raise
+
+        self.metrics.record_checkout(time.perf_counter() - start)
+        return connection
+
+
+class MeteredQueuePool(MeteredPool, QueuePool):
+    metrics = PoolMetrics()
+
+
+class MeteredAsyncQueuePool(MeteredPool, AsyncAdaptedQueuePool):
+    metrics = PoolMetrics()
@@ -0,0 +1,68 @@
+import time
+import uuid
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional
+
+from app.core.config import settings
+from app.schemas.user import UserPrincipal
+
+
+class PrincipalCache:
+    """
+    Users behind recently seen access tokens, so authenticated requests do
+    not have to decode the token and load the user every time. Entries
+    expire after a short time, or with the token if that comes first, and
+    are dropped as soon as the user changes.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, UserPrincipal]] = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, token: str) -> Optional[UserPrincipal]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if not entry:
+                return None
+
+            expires_at, principal = entry
+            if expires_at <= time.monotonic():
+                del self._entries[token]
+                return None
+
+            self._entries.move_to_end(token)
+            return principal
+
+    def set(self, token: str, principal: UserPrincipal, token_exp: float) -> None:
+        # The token expiration is a timestamp, the entries use the monotonic clock
+        ttl = min(self.ttl, token_exp - time.time())
+        if ttl <= 0:
+            return
+
+        with self._lock:
+            self._entries[token] = (time.monotonic() + ttl, principal)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: uuid.UUID) -> None:
+        with self._lock:
+            tokens = [
+                token
+                for token, (_, principal) in self._entries.items()
+                if principal.id == user_id
+            ]
+            for token in tokens:
+                del self._entries[token]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache(
+    settings.PRINCIPAL_CACHE_SIZE, settings.PRINCIPAL_CACHE_TTL_SECONDS
+)
@@ -0,0 +1,44 @@
+from functools import cache
+from typing import Any
+
+import orjson
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from app.core.config import settings
+
+
+@cache
+def type_adapter(model: type) -> TypeAdapter[Any]:
+    return TypeAdapter(model)
+
+
+class ModelResponse(Response):
+    """
+    A validated response model serialized straight to JSON by pydantic.
+    FastAPI sends returned responses as they are, so the response_model of
+    the route only documents it and the content is not validated again.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return type_adapter(type(content)).dump_json(content)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse encoded by orjson, which also encodes UUIDs, datetimes and
+    dataclasses by itself.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def default_response_class() -> type[JSONResponse]:
+    if settings.JSON_RESPONSE_ENCODER == "orjson":
+        return FastJSONResponse
+
+    return JSONResponse
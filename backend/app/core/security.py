@@ -1,15 +1,38 @@
 from datetime import datetime, timedelta, timezone
-from typing import Any
+from typing import Any, Optional
 
 import jwt
 from passlib.context import CryptContext
 from app.core.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+PASSWORD_SCHEMES = ("bcrypt", "argon2")
 
 ALGORITHM = "HS256"
 
 
+def create_password_context(
+    scheme: str = settings.PASSWORD_HASH_SCHEME,
+    bcrypt_rounds: int = settings.PASSWORD_BCRYPT_ROUNDS,
+    argon2_time_cost: int = settings.PASSWORD_ARGON2_TIME_COST,
+    argon2_memory_cost: int = settings.PASSWORD_ARGON2_MEMORY_COST,
+    argon2_parallelism: int = settings.PASSWORD_ARGON2_PARALLELISM,
+) -> CryptContext:
+    # Hashes of every scheme are verified, but only those made with the
+    # first one and its current costs are left as they are
+    schemes = [scheme] + [s for s in PASSWORD_SCHEMES if s != scheme]
+    return CryptContext(
+        schemes=schemes,
+        deprecated="auto",
+        bcrypt__rounds=bcrypt_rounds,
+        argon2__time_cost=argon2_time_cost,
+        argon2__memory_cost=argon2_memory_cost,
+        argon2__parallelism=argon2_parallelism,
+    )
+
+
+pwd_context = create_password_context()
+
+
 def create_access_token(subject: str | Any, expires_delta: timedelta, is_admin: bool = False) -> str:
     expire = datetime.now(timezone.utc) + expires_delta
     to_encode = {"exp": expire, "sub": str(subject), "is_admin": is_admin, "type": "access_token"}
@@ -21,5 +44,19 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, Optional[str]]:
+    """
+    Verifies the password and, when its hash needs an update, hashes it
+    again with the current policy.
+    """
+    verified = pwd_context.verify(plain_password, hashed_password)
+    if verified and pwd_context.needs_update(hashed_password):
+        return True, pwd_context.hash(plain_password)
+
+    return verified, None
+
+
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
@@ -4,9 +4,14 @@ import datetime
 import re
 import os
 
-from app.models.author import Author
+from app.models.author import Author, author_poem
 from app.models.poem import Poem
+# Building the loader options below configures the mappers, all of them
+# have to be imported by then
+from app.models.collection import Collection  # noqa: F401
+from app.models.user import User  # noqa: F401
 from app.schemas.author import (
+    AuthorPublicBasic,
     AuthorSchema,
     AuthorCreate,
     AuthorSearchParams,
@@ -14,89 +19,155 @@ from app.schemas.author import (
     AuthorUpdateBasic,
 )
 
-from sqlalchemy.orm import Session, aliased
-from sqlalchemy import Select, select, func, desc
+from app.core.pagination import keyset_filter
+from app.schemas.common import SchemaT
+from app.core.principal_cache import principal_cache
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import ColumnElement, Select, literal, select, func
+
+
+# Everything AuthorSchema reads. Ordering by poems groups by author, so the
+# user is loaded by a query of its own rather than joined
+AUTHOR_SCHEMA_OPTIONS = [
+    selectinload(Author.user),
+    selectinload(Author.poems).options(
+        selectinload(Poem.authors), joinedload(Poem.original_reference)
+    ),
+]
 
 
 class AuthorCRUD:
     def get_by_id(
         self, db: Session, obj_id: Optional[uuid.UUID]
     ) -> Optional[AuthorSchema]:
-        db_obj = db.get(Author, obj_id)
+        db_obj = db.get(Author, obj_id, options=AUTHOR_SCHEMA_OPTIONS)
         return AuthorSchema.model_validate(db_obj) if db_obj else None
 
+    async def get_by_id_async(
+        self, db: AsyncSession, obj_id: Optional[uuid.UUID]
+    ) -> Optional[AuthorSchema]:
+        return await db.run_sync(self.get_by_id, obj_id)
+
     def get_by_name(self, db: Session, name: str) -> Optional[AuthorSchema]:
         db_obj = db.scalars(select(Author).filter(Author.full_name == name)).first()
         return AuthorSchema.model_validate(db_obj) if db_obj else None
 
     def get_many(
+        self,
+        db: Session,
+        queryParams: AuthorSearchParams,
+        public_restricted: bool = True,
+        *,
+        schema: type[SchemaT],
+    ) -> list[SchemaT]:
+        statement = self.build_page_query(queryParams, public_restricted)
+        statement = statement.options(*AUTHOR_SCHEMA_OPTIONS)
+        return [schema.model_validate(db_obj) for db_obj in db.scalars(statement).all()]
+
+    def get_many_basic(
         self, db: Session, queryParams: AuthorSearchParams, public_restricted: bool = True
-    ) -> list[AuthorSchema]:
-        birth_filter = self.filter_by_dates(queryParams.author_birth_date, "birth_date")
-        death_filter = self.filter_by_dates(queryParams.author_death_date, "death_date")
-        poem_filter = select(Author).where(
-            Author.id.in_(self.filter_by_poem(db, queryParams, public_restricted))
+    ) -> list[AuthorPublicBasic]:
+        statement = self.build_page_query(queryParams, public_restricted).with_only_columns(
+            Author.id, Author.full_name
         )
-        name_filter = self.filter_by_name(queryParams)
+        return [AuthorPublicBasic.model_validate(row) for row in db.execute(statement)]
 
-        stmt = name_filter.intersect(poem_filter, birth_filter, death_filter).subquery()
-        alias = aliased(Author, stmt)
+    def get_many_with_count(
+        self,
+        db: Session,
+        queryParams: AuthorSearchParams,
+        public_restricted: bool = True,
+        *,
+        schema: type[SchemaT],
+    ) -> tuple[list[SchemaT], int]:
+        # The window count would only see the rows after the cursor
+        if queryParams.author_cursor is not None:
+            return (
+                self.get_many(db, queryParams, public_restricted, schema=schema),
+                self.get_count(db, queryParams, public_restricted),
+            )
+
+        statement = self.build_page_query(queryParams, public_restricted)
+        statement = statement.options(*AUTHOR_SCHEMA_OPTIONS)
+        rows = db.execute(statement.add_columns(func.count().over())).all()
+
+        # An offset past the end returns no rows to read the total from
+        if not rows:
+            count = self.get_count(db, queryParams, public_restricted) if queryParams.author_skip else 0
+            return [], count
+
+        return [schema.model_validate(row[0]) for row in rows], rows[0][1]
+
+    def build_page_query(
+        self, queryParams: AuthorSearchParams, public_restricted: bool = True
+    ) -> Select:
+        statement = self.build_search_query(queryParams, public_restricted)
+
+        if queryParams.author_fuzzy and queryParams.author_full_name != "":
+            # Closest names first, cursors are rejected by AuthorSearchParams
+            similarity = func.word_similarity(queryParams.author_full_name, Author.full_name)
+            return (
+                statement.order_by(similarity.desc(), Author.id)
+                .offset(queryParams.author_skip)
+                .limit(queryParams.author_limit)
+            )
 
         if queryParams.author_order_by != "poems":
+            column = getattr(Author, queryParams.author_order_by)
             if queryParams.author_desc:
-                order = getattr(alias, queryParams.author_order_by).desc().nulls_last()
+                order = column.desc().nulls_last()
             else:
-                order = getattr(alias, queryParams.author_order_by).nulls_first()
-
-            db_objs = db.scalars(
-                select(alias)
-                .offset(queryParams.author_skip)
-                .limit(queryParams.author_limit)
-                .order_by(order)
-            ).all()
-
+                order = column.nulls_first()
         else:
-            label = "poem_count"
+            statement = statement.join(Author.poems).group_by(Author.id)
             if queryParams.author_desc:
-                order = desc(label)
+                order = func.count(Poem.id).desc()
             else:
-                order = label
-
-            db_objs = db.scalars(
-                select(alias, func.count(Poem.id).label(label))
-                .join(alias.poems)
-                .group_by(alias)
-                .offset(queryParams.author_skip)
-                .limit(queryParams.author_limit)
-                .order_by(order)
-            ).all()
+                order = func.count(Poem.id)
+
+        statement = statement.order_by(order, Author.id).limit(queryParams.author_limit)
+        if queryParams.author_cursor is not None:
+            # Cursors are rejected by AuthorSearchParams when ordering by poems
+            return statement.where(
+                keyset_filter(
+                    column,
+                    Author.id,
+                    queryParams.author_cursor,
+                    queryParams.author_order_by,
+                    queryParams.author_desc,
+                )
+            )
 
-        return [AuthorSchema.model_validate(db_obj) for db_obj in db_objs]
+        return statement.offset(queryParams.author_skip)
     
     def get_count(self, db: Session, queryParams: AuthorSearchParams, public_restricted: bool = True) -> int:
-        birth_filter = self.filter_by_dates(queryParams.author_birth_date, "birth_date")
-        death_filter = self.filter_by_dates(queryParams.author_death_date, "death_date")
-        poem_filter = select(Author).where(
-            Author.id.in_(self.filter_by_poem(db, queryParams, public_restricted))
-        )
-        name_filter = self.filter_by_name(queryParams)
-
-        stmt = name_filter.intersect(poem_filter, birth_filter, death_filter).subquery()
-        alias = aliased(Author, stmt)
-        
-        statement = select(func.count()).select_from(alias)
-        count = db.execute(statement).scalar()
+        statement = self.build_search_query(queryParams, public_restricted)
 
+        count = db.execute(
+            select(func.count()).select_from(statement.subquery())
+        ).scalar()
         return count if count else 0
 
+    def build_search_query(
+        self, queryParams: AuthorSearchParams, public_restricted: bool = True
+    ) -> Select:
+        filters = [
+            self.filter_by_name(queryParams),
+            self.filter_by_dates(queryParams.author_birth_date, "birth_date"),
+            self.filter_by_dates(queryParams.author_death_date, "death_date"),
+            self.filter_by_poem(queryParams, public_restricted),
+        ]
+        return select(Author).where(*[f for f in filters if f is not None])
+
     def filter_by_poem(
-        self, db: Session, query: AuthorSearchParams, public_restricted: bool = True
-    ) -> list[uuid.UUID]:
+        self, query: AuthorSearchParams, public_restricted: bool = True
+    ) -> Optional[ColumnElement[bool]]:
         regex = r"(>|<|>=|<=|=|)(\d+)"
         m = re.match(regex, query.author_poems)
 
         if not m:
-            return [a.id for a in db.scalars(select(Author)).all()]
+            return None
 
         match m.group(1):
             case ">=":
@@ -111,52 +182,46 @@ class AuthorCRUD:
                 h = func.count(Poem.id) == int(m.group(2))
 
         s = (
-            select(Author, func.count(Poem.id))
-            .join(Author.poems)
-            .group_by(Author.id)
+            select(author_poem.c.author_id)
+            .join(Poem, Poem.id == author_poem.c.poem_id)
+            .group_by(author_poem.c.author_id)
             .having(h)
         )
         
         if public_restricted:
             s = s.where(Poem.is_public == True)
 
-        return [a.id for a in db.scalars(s).all()]
+        return Author.id.in_(s)
 
-    def filter_by_dates(self, q: str, date: str) -> Select:
+    def filter_by_dates(self, q: str, date: str) -> Optional[ColumnElement[bool]]:
         regex = r"(>|<|>=|<=|=|)(\d+)"
         m = re.match(regex, q)
 
         if not m:
-            return select(Author)
+            return None
 
+        column = getattr(Author, date)
         match m.group(1):
             case ">=":
-                s = select(Author).where(
-                     getattr(Author, date) >= datetime.date(int(m.group(2)), 1, 1)
-                )
+                return column >= datetime.date(int(m.group(2)), 1, 1)
             case ">":
-                s = select(Author).where(
-                    getattr(Author, date) >= datetime.date(int(m.group(2)) + 1, 1, 1)
-                )
+                return column >= datetime.date(int(m.group(2)) + 1, 1, 1)
             case "<=":
-                s = select(Author).where(
-                    getattr(Author, date) <= datetime.date(int(m.group(2)), 12, 31)
-                )
+                return column <= datetime.date(int(m.group(2)), 12, 31)
             case "<":
-                s = select(Author).where(
-                    getattr(Author, date) <= datetime.date(int(m.group(2)) - 1, 12, 31)
-                )
+                return column <= datetime.date(int(m.group(2)) - 1, 12, 31)
             case _:
-                s = select(Author).where(
-                    getattr(Author, date).between(
-                        datetime.date(int(m.group(2)), 1, 1),
-                        datetime.date(int(m.group(2)), 12, 31),
-                    )
+                return column.between(
+                    datetime.date(int(m.group(2)), 1, 1),
+                    datetime.date(int(m.group(2)), 12, 31),
                 )
-        return s
 
-    def filter_by_name(self, query: AuthorSearchParams) -> Select:
-        return select(Author).where(Author.full_name.icontains(query.author_full_name))
+    def filter_by_name(self, query: AuthorSearchParams) -> Optional[ColumnElement[bool]]:
+        if query.author_full_name == "":
+            return None
+        if query.author_fuzzy:
+            return literal(query.author_full_name).op("<%")(Author.full_name)
+        return Author.full_name.icontains(query.author_full_name)
 
     def create(self, db: Session, obj_create: AuthorCreate) -> AuthorSchema:
         obj_create_data = obj_create.model_dump(exclude_unset=True)
@@ -205,8 +270,13 @@ class AuthorCRUD:
             except: 
                 pass
 
+        # Deleting the author unlinks its user
+        user_id = db_obj.user.id if db_obj.user else None
         db.delete(db_obj)
         db.commit()
 
+        if user_id:
+            principal_cache.invalidate(user_id)
+
 
 author_crud = AuthorCRUD()
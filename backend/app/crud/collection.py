@@ -4,56 +4,145 @@ import uuid
 
 from app.models.collection import Collection
 
-from sqlalchemy.orm import Session, aliased
-from sqlalchemy import select, Select, func
+from app.core.pagination import keyset_filter
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import ColumnElement, literal, select, Select, func
 
 from app.models.poem import Poem
-from app.schemas.collection import CollectionCreate, CollectionSchema, CollectionSearchParams, CollectionUpdate
+from app.models.user import User
+from app.schemas.collection import CollectionCreate, CollectionPublicBasic, CollectionSchema, CollectionSearchParams, CollectionUpdate
+from app.schemas.common import SchemaT
+
+
+# Everything CollectionSchema reads, the poems are read as PoemPublic
+COLLECTION_SCHEMA_OPTIONS = [
+    joinedload(Collection.user),
+    selectinload(Collection.poems).options(
+        selectinload(Poem.authors), joinedload(Poem.original_reference)
+    ),
+]
 
 
 class CollectionCRUD:
     def get_by_id(self, db: Session, obj_id: uuid.UUID) -> Optional[CollectionSchema]:
-        db_obj = db.get(Collection, obj_id)
+        db_obj = db.get(Collection, obj_id, options=COLLECTION_SCHEMA_OPTIONS)
         if not db_obj:
             return None
 
         return CollectionSchema.model_validate(db_obj)
+
+    async def get_by_id_async(
+        self, db: AsyncSession, obj_id: uuid.UUID
+    ) -> Optional[CollectionSchema]:
+        return await db.run_sync(self.get_by_id, obj_id)
     
-    def get_many(self, db: Session, queryParams: CollectionSearchParams, public_restricted: bool = True) -> list[CollectionSchema]:
-        name_filter = self.filter_by_name(queryParams.collection_name)
+    def get_many(
+        self,
+        db: Session,
+        queryParams: CollectionSearchParams,
+        public_restricted: bool = True,
+        *,
+        schema: type[SchemaT],
+    ) -> list[SchemaT]:
+        statement = self.build_page_query(queryParams, public_restricted)
+        statement = statement.options(*COLLECTION_SCHEMA_OPTIONS)
+        return [schema.model_validate(db_obj) for db_obj in db.scalars(statement).all()]
+
+    def get_many_basic(
+        self, db: Session, queryParams: CollectionSearchParams, public_restricted: bool = True
+    ) -> list[CollectionPublicBasic]:
+        statement = (
+            self.build_page_query(queryParams, public_restricted)
+            .with_only_columns(Collection.id, Collection.name, Collection.is_public, User.username)
+            .join(User, Collection.user_id == User.id)
+        )
+        return [CollectionPublicBasic.model_validate(row) for row in db.execute(statement)]
+
+    def get_many_with_count(
+        self,
+        db: Session,
+        queryParams: CollectionSearchParams,
+        public_restricted: bool = True,
+        *,
+        schema: type[SchemaT],
+    ) -> tuple[list[SchemaT], int]:
+        # The window count would only see the rows after the cursor
+        if queryParams.collection_cursor is not None:
+            return (
+                self.get_many(db, queryParams, public_restricted, schema=schema),
+                self.get_count(db, queryParams, public_restricted),
+            )
+
+        statement = self.build_page_query(queryParams, public_restricted)
+        statement = statement.options(*COLLECTION_SCHEMA_OPTIONS)
+        rows = db.execute(statement.add_columns(func.count().over())).all()
+
+        # An offset past the end returns no rows to read the total from
+        if not rows:
+            count = self.get_count(db, queryParams, public_restricted) if queryParams.collection_skip else 0
+            return [], count
+
+        return [schema.model_validate(row[0]) for row in rows], rows[0][1]
+
+    def build_page_query(
+        self, queryParams: CollectionSearchParams, public_restricted: bool = True
+    ) -> Select:
+        statement = self.build_search_query(queryParams, public_restricted)
+
+        if queryParams.collection_fuzzy and queryParams.collection_name != "":
+            # Closest names first, cursors are rejected by CollectionSearchParams
+            similarity = func.word_similarity(queryParams.collection_name, Collection.name)
+            return (
+                statement.order_by(similarity.desc(), Collection.id)
+                .offset(queryParams.collection_skip)
+                .limit(queryParams.collection_limit)
+            )
+
         if queryParams.collection_desc:
             order = Collection.name.desc()
         else: 
             order = Collection.name.asc()
             
-        statement = (
-            name_filter
-            .offset(queryParams.collection_skip)
-            .limit(queryParams.collection_limit)
-            .order_by(order)
-        )
-            
-        if public_restricted:
-            statement = statement.where(Collection.is_public == True)
-
-        return [CollectionSchema.model_validate(db_obj) for db_obj in db.scalars(statement).all()]
+        statement = statement.order_by(order, Collection.id).limit(queryParams.collection_limit)
+        if queryParams.collection_cursor is not None:
+            return statement.where(
+                keyset_filter(
+                    Collection.name,
+                    Collection.id,
+                    queryParams.collection_cursor,
+                    "name",
+                    queryParams.collection_desc,
+                )
+            )
+
+        return statement.offset(queryParams.collection_skip)
     
     def get_count(self, db: Session, queryParams: CollectionSearchParams, public_restricted: bool = True) -> int:
-        name_filter = self.filter_by_name(queryParams.collection_name)
-        
-        if public_restricted:
-            name_filter = name_filter.where(Collection.is_public == True)
-            
-        alias = aliased(Collection, name_filter.subquery())
-
-        
-        statement = select(func.count()).select_from(alias)
-        count = db.execute(statement).scalar()
+        statement = self.build_search_query(queryParams, public_restricted)
 
+        count = db.execute(
+            select(func.count()).select_from(statement.subquery())
+        ).scalar()
         return count if count else 0
+
+    def build_search_query(
+        self, queryParams: CollectionSearchParams, public_restricted: bool = True
+    ) -> Select:
+        filters = [
+            self.filter_by_name(queryParams.collection_name, queryParams.collection_fuzzy)
+        ]
+        if public_restricted:
+            filters.append(Collection.is_public == True)
+
+        return select(Collection).where(*[f for f in filters if f is not None])
     
-    def filter_by_name(self, query: str) -> Select:
-        return select(Collection).where(Collection.name.icontains(query))
+    def filter_by_name(self, query: str, fuzzy: bool = False) -> Optional[ColumnElement[bool]]:
+        if query == "":
+            return None
+        if fuzzy:
+            return literal(query).op("<%")(Collection.name)
+        return Collection.name.icontains(query)
     
     def create(self, db: Session, obj_create: CollectionCreate) -> Optional[CollectionSchema]:
         obj_create_data = obj_create.model_dump(exclude_unset=True)
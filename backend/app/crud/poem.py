@@ -2,15 +2,23 @@ import datetime
 import uuid
 import re
 import random
+import unicodedata
 from typing import Optional
 
-from sqlalchemy.orm import Session, aliased
-from sqlalchemy import select, func, Select
+from app.core.pagination import keyset_filter
+from app.schemas.common import SchemaT
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, selectinload, undefer
+from sqlalchemy import ColumnElement, String, and_, cast, literal, or_, select, func, Select
+from sqlalchemy.dialects.postgresql import ARRAY, REGCONFIG
 from app.models.poem import Poem, Poem_Poem
 from app.models.author import Author, author_poem
+from app.poem_cache import render_cache
+from app.render_queue import render_queue
 
 from app.schemas.poem import (
     PoemCreate,
+    PoemPublicBasic,
     PoemSchema,
     PoemSearchParams,
     PoemUpdate,
@@ -21,203 +29,348 @@ from app.schemas.poem import (
 )
 
 
+# Postgres text search configurations for the languages poems are usually
+# written in. Any other language is indexed without stemming.
+SEARCH_CONFIGS = {
+    "es": "spanish",
+    "espanol": "spanish",
+    "castellano": "spanish",
+    "spanish": "spanish",
+    "en": "english",
+    "ingles": "english",
+    "english": "english",
+    "fr": "french",
+    "frances": "french",
+    "french": "french",
+    "de": "german",
+    "aleman": "german",
+    "german": "german",
+    "it": "italian",
+    "italiano": "italian",
+    "italian": "italian",
+    "pt": "portuguese",
+    "portugues": "portuguese",
+    "portuguese": "portuguese",
+    "ca": "catalan",
+    "catalan": "catalan",
+    "eu": "basque",
+    "euskera": "basque",
+    "basque": "basque",
+}
+
+
+def count_verses(content: str) -> int:
+    return len(content.split("\n"))
+
+
+def search_config(language: Optional[str]) -> str:
+    if not language:
+        return "simple"
+
+    normalized = unicodedata.normalize("NFKD", language.strip().lower())
+    normalized = "".join(c for c in normalized if not unicodedata.combining(c))
+    return SEARCH_CONFIGS.get(normalized, "simple")
+
+
+# Everything PoemSchema reads, loaded with the same number of queries for
+# any number of poems. The original and derived poems are read as
+# PoemPublic, which needs their authors and type. The derived poems are a
+# collection, so they are loaded with a second query rather than joined,
+# which would repeat the poems and break the limit of pages.
+POEM_SCHEMA_OPTIONS = [
+    selectinload(Poem.authors),
+    joinedload(Poem.original_reference)
+    .joinedload(Poem_Poem.original_poem)
+    .options(selectinload(Poem.authors), joinedload(Poem.original_reference)),
+    selectinload(Poem.derived_poems_references)
+    .joinedload(Poem_Poem.derived_poem)
+    .options(selectinload(Poem.authors), joinedload(Poem.original_reference)),
+]
+
+
 class PoemCRUD:
     def get_by_id(
         self, db: Session, obj_id: Optional[uuid.UUID]
     ) -> Optional[PoemSchema]:
-        db_obj = db.get(Poem, obj_id)
-        return PoemSchema.model_validate(db_obj) if db_obj else None
+        db_obj = db.get(
+            Poem, obj_id, options=[undefer(Poem.content_html), *POEM_SCHEMA_OPTIONS]
+        )
+        return self.to_rendered_schema(db_obj) if db_obj else None
 
-    def get_random(self, db: Session) -> Optional[PoemSchema]:
-        poem_ids = db.scalars(select(Poem.id).where(Poem.is_public == True)).all()
-        if poem_ids == []: 
-            return None
-        
-        poem = random.choice(poem_ids)
+    async def get_by_id_async(
+        self, db: AsyncSession, obj_id: Optional[uuid.UUID]
+    ) -> Optional[PoemSchema]:
+        # run_sync runs the same queries on the async connection, including
+        # the lazy loads made while building the schema
+        return await db.run_sync(self.get_by_id, obj_id)
+
+    def to_rendered_schema(self, db_obj: Poem) -> PoemSchema:
+        poem = PoemSchema.model_validate(db_obj)
+        poem.rendered_content = db_obj.content_html
+        return poem
+
+    def get_random(self, db: Session, key: Optional[float] = None) -> Optional[PoemSchema]:
+        if key is None:
+            key = random.random()
+
+        # First public poem at or after the key, wrapping around to the
+        # start, so only one index entry is read
+        statement = (
+            select(Poem)
+            .options(undefer(Poem.content_html), *POEM_SCHEMA_OPTIONS)
+            .where(Poem.is_public == True)
+            .order_by(Poem.random_key)
+            .limit(1)
+        )
+        db_obj = db.scalars(statement.where(Poem.random_key >= key)).first()
+        if not db_obj:
+            db_obj = db.scalars(statement).first()
 
-        return self.get_by_id(db, poem)
+        return self.to_rendered_schema(db_obj) if db_obj else None
+
+    async def get_random_async(self, db: AsyncSession) -> Optional[PoemSchema]:
+        return await db.run_sync(self.get_random)
+
+    def get_daily(self, db: Session, day: datetime.date) -> Optional[PoemSchema]:
+        # The same key for the whole day, on every worker
+        return self.get_random(db, key=random.Random(day.toordinal()).random())
 
     def get_many(
+        self,
+        db: Session,
+        queryParams: PoemSearchParams,
+        public_restricted: bool = True,
+        *,
+        schema: type[SchemaT],
+    ) -> list[SchemaT]:
+        statement = self.build_page_query(queryParams, public_restricted)
+        statement = statement.options(*POEM_SCHEMA_OPTIONS)
+        return [schema.model_validate(db_obj) for db_obj in db.scalars(statement).all()]
+
+    def get_many_basic(
         self, db: Session, queryParams: PoemSearchParams, public_restricted: bool = True
-    ) -> list[PoemSchema]:
-        created_at_filter = self.filter_dates(queryParams.poem_created_at, "created_at")
-        updated_at_filter = self.filter_dates(queryParams.poem_updated_at, "updated_at")
-        title_filter = self.filter_by_title(queryParams)
-        type_filter = self.filter_by_type(queryParams, db)
-        language_filter = self.filter_by_language(queryParams)
-        verses_filter = self.filter_by_num_verses(queryParams, db)
-        author_filter = self.filter_by_author(db, queryParams.poem_author)
-
-        stmt = title_filter.intersect(
-            type_filter,
-            title_filter,
-            created_at_filter,
-            updated_at_filter,
-            language_filter,
-            verses_filter,
-            author_filter,
-        ).subquery()
-        alias = aliased(Poem, stmt)
-
-        if queryParams.poem_desc:
-            order = getattr(alias, queryParams.poem_order_by).desc().nulls_last()
-        else:
-            order = getattr(alias, queryParams.poem_order_by).nulls_first()
-        s = (
-            select(alias)
-            .offset(queryParams.poem_skip)
-            .limit(queryParams.poem_limit)
-            .order_by(order)
+    ) -> list[PoemPublicBasic]:
+        # Only the columns of PoemPublicBasic, with the author names of each
+        # poem gathered by the same query
+        author_names = (
+            select(Author.full_name)
+            .join(author_poem, Author.id == author_poem.c.author_id)
+            .where(author_poem.c.poem_id == Poem.id)
+            .scalar_subquery()
         )
+        statement = self.build_page_query(queryParams, public_restricted).with_only_columns(
+            Poem.id,
+            Poem.title,
+            Poem.is_public,
+            Poem.show_author,
+            func.array(author_names, type_=ARRAY(String)).label("author_names"),
+        )
+        return [PoemPublicBasic.model_validate(row) for row in db.execute(statement)]
 
-        if public_restricted:
-            s = s.where(alias.is_public == True)
+    def get_many_with_count(
+        self,
+        db: Session,
+        queryParams: PoemSearchParams,
+        public_restricted: bool = True,
+        *,
+        schema: type[SchemaT],
+    ) -> tuple[list[SchemaT], int]:
+        # The window count would only see the rows after the cursor
+        if queryParams.poem_cursor is not None:
+            return (
+                self.get_many(db, queryParams, public_restricted, schema=schema),
+                self.get_count(db, queryParams, public_restricted),
+            )
+
+        statement = self.build_page_query(queryParams, public_restricted)
+        statement = statement.options(*POEM_SCHEMA_OPTIONS)
+        rows = db.execute(statement.add_columns(func.count().over())).all()
 
-        return [PoemSchema.model_validate(db_obj) for db_obj in db.scalars(s).all()]
+        # An offset past the end returns no rows to read the total from
+        if not rows:
+            count = self.get_count(db, queryParams, public_restricted) if queryParams.poem_skip else 0
+            return [], count
 
+        return [schema.model_validate(row[0]) for row in rows], rows[0][1]
 
     def get_count(
         self, db: Session, queryParams: PoemSearchParams, public_restricted: bool = True
     ) -> int:
-        created_at_filter = self.filter_dates(queryParams.poem_created_at, "created_at")
-        updated_at_filter = self.filter_dates(queryParams.poem_updated_at, "updated_at")
-        title_filter = self.filter_by_title(queryParams)
-        type_filter = self.filter_by_type(queryParams, db)
-        language_filter = self.filter_by_language(queryParams)
-        verses_filter = self.filter_by_num_verses(queryParams, db)
-        author_filter = self.filter_by_author(db, queryParams.poem_author)
-
-        stmt = title_filter.intersect(
-            type_filter,
-            title_filter,
-            created_at_filter,
-            updated_at_filter,
-            language_filter,
-            verses_filter,
-            author_filter,
-        ).subquery()
-        alias = aliased(Poem, stmt)
-
-        statement = select(func.count()).select_from(alias)
-        if public_restricted:
-            statement = statement.where(alias.is_public == True)
+        statement = self.build_search_query(queryParams, public_restricted)
 
-        count = db.execute(statement).scalar()
+        count = db.execute(
+            select(func.count()).select_from(statement.subquery())
+        ).scalar()
         return count if count else 0
 
-    def filter_by_language(self, query: PoemSearchParams) -> Select:
+    def build_page_query(
+        self, queryParams: PoemSearchParams, public_restricted: bool = True
+    ) -> Select:
+        statement = self.build_search_query(queryParams, public_restricted)
+
+        if queryParams.poem_fuzzy and queryParams.poem_title != "":
+            # Closest titles first, cursors are rejected by PoemSearchParams
+            similarity = func.word_similarity(queryParams.poem_title, Poem.title)
+            return (
+                statement.order_by(similarity.desc(), Poem.id)
+                .offset(queryParams.poem_skip)
+                .limit(queryParams.poem_limit)
+            )
+
+        if queryParams.poem_order_by == "rank":
+            # Most relevant first when descending like the other columns,
+            # cursors are rejected by PoemSearchParams
+            rank = self.search_rank(queryParams.poem_query)
+            order = rank.desc() if queryParams.poem_desc else rank
+            return (
+                statement.order_by(order, Poem.id)
+                .offset(queryParams.poem_skip)
+                .limit(queryParams.poem_limit)
+            )
+
+        column = getattr(Poem, queryParams.poem_order_by)
+        if queryParams.poem_desc:
+            order = column.desc().nulls_last()
+        else:
+            order = column.nulls_first()
+
+        statement = statement.order_by(order, Poem.id).limit(queryParams.poem_limit)
+        if queryParams.poem_cursor is not None:
+            return statement.where(
+                keyset_filter(
+                    column,
+                    Poem.id,
+                    queryParams.poem_cursor,
+                    queryParams.poem_order_by,
+                    queryParams.poem_desc,
+                )
+            )
+
+        return statement.offset(queryParams.poem_skip)
+
+    def build_search_query(
+        self, queryParams: PoemSearchParams, public_restricted: bool = True
+    ) -> Select:
+        filters = [
+            self.filter_by_title(queryParams),
+            self.filter_by_query(queryParams),
+            self.filter_dates(queryParams.poem_created_at, "created_at"),
+            self.filter_dates(queryParams.poem_updated_at, "updated_at"),
+            self.filter_by_language(queryParams),
+            self.filter_by_num_verses(queryParams),
+            self.filter_by_author(queryParams.poem_author),
+        ]
+        if public_restricted:
+            filters.append(Poem.is_public == True)
+
+        statement = self.filter_by_type(select(Poem), queryParams)
+        return statement.where(*[f for f in filters if f is not None])
+
+    def filter_by_language(self, query: PoemSearchParams) -> Optional[ColumnElement[bool]]:
         if query.poem_language == "":
-            return select(Poem)
-        return select(Poem).where(Poem.language.icontains(query.poem_language))
+            return None
+        return Poem.language.icontains(query.poem_language)
 
-    def filter_dates(self, date: str, col: str) -> Select:
+    def filter_dates(self, date: str, col: str) -> Optional[ColumnElement[bool]]:
         regex = r"(>|<|>=|<=|=|)(\d+)"
         m = re.match(regex, date)
 
         if not m:
-            return select(Poem)
+            return None
 
+        column = getattr(Poem, col)
         match m.group(1):
             case ">=":
-                s = select(Poem).where(
-                    getattr(Poem, col) >= datetime.date(int(m.group(2)), 1, 1)
-                )
+                return column >= datetime.date(int(m.group(2)), 1, 1)
             case ">":
-                s = select(Poem).where(
-                    getattr(Poem, col) >= datetime.date(int(m.group(2)) + 1, 1, 1)
-                )
+                return column >= datetime.date(int(m.group(2)) + 1, 1, 1)
             case "<=":
-                s = select(Poem).where(
-                    getattr(Poem, col) <= datetime.date(int(m.group(2)), 12, 31)
-                )
+                return column <= datetime.date(int(m.group(2)), 12, 31)
             case "<":
-                s = select(Author).where(
-                    getattr(Poem, col) <= datetime.date(int(m.group(2)) - 1, 12, 31)
-                )
+                return column <= datetime.date(int(m.group(2)) - 1, 12, 31)
             case _:
-                s = select(Poem).where(
-                    getattr(Poem, col).between(
-                        datetime.date(int(m.group(2)), 1, 1),
-                        datetime.date(int(m.group(2)), 12, 31),
-                    )
+                return column.between(
+                    datetime.date(int(m.group(2)), 1, 1),
+                    datetime.date(int(m.group(2)), 12, 31),
                 )
-        return s
 
-    def filter_by_title(self, query: PoemSearchParams) -> Select:
+    def filter_by_title(self, query: PoemSearchParams) -> Optional[ColumnElement[bool]]:
         if query.poem_title == "":
-            return select(Poem)
-        return select(Poem).where(Poem.title.icontains(query.poem_title))
+            return None
+        if query.poem_fuzzy:
+            return literal(query.poem_title).op("<%")(Poem.title)
+        return Poem.title.icontains(query.poem_title)
 
-    def filter_by_num_verses(self, query: PoemSearchParams, db: Session) -> Select:
+    def filter_by_query(self, query: PoemSearchParams) -> Optional[ColumnElement[bool]]:
+        if query.poem_query == "":
+            return None
+
+        # One constant tsquery per configuration, so each branch can use the
+        # GIN index on search_vector
+        return or_(
+            *[
+                and_(
+                    Poem.search_config == cast(config, REGCONFIG),
+                    Poem.search_vector.op("@@")(
+                        func.websearch_to_tsquery(cast(config, REGCONFIG), query.poem_query)
+                    ),
+                )
+                for config in sorted(set(SEARCH_CONFIGS.values()) | {"simple"})
+            ]
+        )
+
+    def search_rank(self, text: str) -> ColumnElement[float]:
+        return func.ts_rank(
+            Poem.search_vector, func.websearch_to_tsquery(Poem.search_config, text)
+        )
+
+    def filter_by_num_verses(self, query: PoemSearchParams) -> Optional[ColumnElement[bool]]:
         regex = r"(>|<|>=|<=|=|)(\d+)"
         m = re.match(regex, query.poem_verses)
 
         if not m:
-            return select(Poem)
+            return None
 
-        all_poems = db.scalars(select(Poem)).all()
         match m.group(1):
             case ">=":
-                poems = [
-                    poem.id
-                    for poem in all_poems
-                    if len(poem.content.split("\n")) >= int(m.group(2))
-                ]
+                return Poem.num_verses >= int(m.group(2))
             case ">":
-                poems = [
-                    poem.id
-                    for poem in all_poems
-                    if len(poem.content.split("\n")) > int(m.group(2))
-                ]
+                return Poem.num_verses > int(m.group(2))
             case "<=":
-                poems = [
-                    poem.id
-                    for poem in all_poems
-                    if len(poem.content.split("\n")) <= int(m.group(2))
-                ]
+                return Poem.num_verses <= int(m.group(2))
             case "<":
-                poems = [
-                    poem.id
-                    for poem in all_poems
-                    if len(poem.content.split("\n")) < int(m.group(2))
-                ]
+                return Poem.num_verses < int(m.group(2))
             case _:
-                poems = [
-                    poem.id
-                    for poem in all_poems
-                    if len(poem.content.split("\n")) == int(m.group(2))
-                ]
-
-        return select(Poem).where(Poem.id.in_(poems))
-
-    def filter_by_type(self, query: PoemSearchParams, db: Session) -> Select:
-        s = select(Poem).join(Poem_Poem, Poem.id == Poem_Poem.derived_poem_id)
+                return Poem.num_verses == int(m.group(2))
 
+    def filter_by_type(self, statement: Select, query: PoemSearchParams) -> Select:
+        # A poem is derived from at most one original, so these joins never
+        # duplicate rows
         match query.poem_type:
             case "version":
-                return s.where(Poem_Poem.type == PoemType.VERSION.value)
+                return statement.join(
+                    Poem_Poem, Poem.id == Poem_Poem.derived_poem_id
+                ).where(Poem_Poem.type == PoemType.VERSION.value)
             case "translation":
-                return s.where(Poem_Poem.type == PoemType.TRANSLATION.value)
+                return statement.join(
+                    Poem_Poem, Poem.id == Poem_Poem.derived_poem_id
+                ).where(Poem_Poem.type == PoemType.TRANSLATION.value)
             case "derived":
-                return s
+                return statement.join(Poem_Poem, Poem.id == Poem_Poem.derived_poem_id)
             case "original":
-                poem_ids = [p.id for p in db.scalars(s).all()]
-                return select(Poem).where(Poem.id.not_in(poem_ids))
+                return statement.outerjoin(
+                    Poem_Poem, Poem.id == Poem_Poem.derived_poem_id
+                ).where(Poem_Poem.derived_poem_id.is_(None))
             case _:
-                return select(Poem)
-            
-    def filter_by_author(self, db:Session, author_name: str) -> Select:
+                return statement
+
+    def filter_by_author(self, author_name: str) -> Optional[ColumnElement[bool]]:
         if author_name == "":
-            return select(Poem)
-        
-        authors = db.scalars(
-            select(Author).where(Author.full_name.icontains(author_name))
-        ).all()
-        if not authors:
-            return select(Poem).where(False) # type: ignore
-        
-        author_ids = [author.id for author in authors]
-        return select(Poem).join(author_poem, Poem.id == author_poem.c.poem_id).where(author_poem.c.author_id.in_(author_ids))
+            return None
+
+        # EXISTS rather than a join, so poems with several matching authors
+        # are only returned once
+        return Poem.authors.any(Author.full_name.icontains(author_name))
 
 
     def create(self, db: Session, obj_create: PoemCreate) -> Optional[PoemSchema]:
@@ -251,6 +404,8 @@ class PoemCRUD:
 
         obj = PoemSchema.model_validate(obj_create_data)
         db_obj = Poem(**obj.model_dump(exclude_unset=True))
+        db_obj.num_verses = count_verses(db_obj.content)
+        db_obj.search_config = search_config(db_obj.language)
 
         db.add(db_obj)
         db.commit()
@@ -272,6 +427,7 @@ class PoemCRUD:
             db.add(db_poem_poem)
             db.commit()
 
+        render_queue.submit(db_obj.id, db_obj.content)
         return PoemSchema.model_validate(db_obj)
 
     def update(
@@ -336,9 +492,20 @@ class PoemCRUD:
         for field, value in obj_update_data.items():
             setattr(db_obj, field, value)
 
+        if "content" in obj_update_data.keys():
+            db_obj.num_verses = count_verses(db_obj.content)
+            db_obj.content_html = None
+            render_cache.invalidate(db_obj.id)
+
+        if "language" in obj_update_data.keys():
+            db_obj.search_config = search_config(db_obj.language)
+
         db.commit()
         db.refresh(db_obj)
 
+        if "content" in obj_update_data.keys():
+            render_queue.submit(db_obj.id, db_obj.content)
+
         return PoemSchema.model_validate(db_obj)
 
     def delete(self, db: Session, obj_id: uuid.UUID) -> None:
@@ -352,6 +519,7 @@ class PoemCRUD:
 
         db.delete(db_obj)
         db.commit()
+        render_cache.invalidate(obj_id)
 
 
 poem_crud = PoemCRUD()
@@ -1,22 +1,35 @@
-import email
 from typing import Optional
 import uuid
 import os
 
-from app.core.security import verify_password, get_password_hash
-from app.crud import author
+from starlette.concurrency import run_in_threadpool
+
+from app.core.password_hasher import password_hasher
 from app.models.user import User
 from app.schemas.user import (
     UserCreate,
+    UserPrincipal,
+    UserPublicBasic,
     UserSchema,
     UserSearchParams,
     UserUpdate,
     UserUpdateMe,
 )
 
-from sqlalchemy.orm import Session, aliased
-from sqlalchemy import Select, select, func
+from app.core.pagination import keyset_filter
+from app.schemas.common import SchemaT
+from app.core.principal_cache import principal_cache
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import ColumnElement, Select, literal, select, func, update
 from app.crud.author import author_crud
+from app.models.collection import Collection
+
+
+# Everything UserSchema reads
+USER_SCHEMA_OPTIONS = [
+    joinedload(User.author),
+    selectinload(User.collections).selectinload(Collection.poems),
+]
 
 
 class UserCRUD:
@@ -35,76 +48,143 @@ class UserCRUD:
     def get_by_id(
         self, db: Session, obj_id: Optional[uuid.UUID]
     ) -> Optional[UserSchema]:
-        db_obj = db.get(User, obj_id)
+        db_obj = db.get(User, obj_id, options=USER_SCHEMA_OPTIONS)
         return UserSchema.model_validate(db_obj) if db_obj else None
 
+    def get_principal(
+        self, db: Session, obj_id: Optional[uuid.UUID]
+    ) -> Optional[UserPrincipal]:
+        statement = select(
+            User.id, User.author_id, User.is_superuser, User.is_verified
+        ).where(User.id == obj_id)
+        row = db.execute(statement).first()
+        return UserPrincipal(*row) if row else None
+
     def get_many(
+        self,
+        db: Session,
+        queryParams: UserSearchParams,
+        public_restricted: bool = True,
+        *,
+        schema: type[SchemaT],
+    ) -> list[SchemaT]:
+        statement = self.build_page_query(queryParams, public_restricted)
+        statement = statement.options(*USER_SCHEMA_OPTIONS)
+        return [schema.model_validate(db_obj) for db_obj in db.scalars(statement).all()]
+
+    def get_many_basic(
         self, db: Session, queryParams: UserSearchParams, public_restricted: bool = True
-    ) -> list[UserSchema]:
-        username_filter = self.filter_by_text(
-            db, queryParams.user_name, "username"
+    ) -> list[UserPublicBasic]:
+        statement = self.build_page_query(queryParams, public_restricted).with_only_columns(
+            User.id, User.username
         )
-        email_filter = self.filter_by_text(db, queryParams.user_email, "email")
-        full_name_filter = self.filter_by_text(
-            db, queryParams.user_full_name, "full_name"
-        )
-        
-        smt = username_filter.intersect(
-            email_filter, full_name_filter
-        ).subquery()
-        alias = aliased(User, smt)
-        
+        return [UserPublicBasic.model_validate(row) for row in db.execute(statement)]
+
+    def get_many_with_count(
+        self,
+        db: Session,
+        queryParams: UserSearchParams,
+        public_restricted: bool = True,
+        *,
+        schema: type[SchemaT],
+    ) -> tuple[list[SchemaT], int]:
+        # The window count would only see the rows after the cursor
+        if queryParams.user_cursor is not None:
+            return (
+                self.get_many(db, queryParams, public_restricted, schema=schema),
+                self.get_count(db, queryParams, public_restricted),
+            )
+
+        statement = self.build_page_query(queryParams, public_restricted)
+        statement = statement.options(*USER_SCHEMA_OPTIONS)
+        rows = db.execute(statement.add_columns(func.count().over())).all()
+
+        # An offset past the end returns no rows to read the total from
+        if not rows:
+            count = self.get_count(db, queryParams, public_restricted) if queryParams.user_skip else 0
+            return [], count
+
+        return [schema.model_validate(row[0]) for row in rows], rows[0][1]
+
+    def build_page_query(
+        self, queryParams: UserSearchParams, public_restricted: bool = True
+    ) -> Select:
+        statement = self.build_search_query(queryParams, public_restricted)
+
+        if queryParams.user_fuzzy and queryParams.user_name != "":
+            # Closest usernames first, cursors are rejected by UserSearchParams
+            similarity = func.word_similarity(queryParams.user_name, User.username)
+            return (
+                statement.order_by(similarity.desc(), User.id)
+                .offset(queryParams.user_skip)
+                .limit(queryParams.user_limit)
+            )
+
+        column = getattr(User, queryParams.user_order_by)
         if queryParams.user_desc:
-            order = getattr(alias, queryParams.user_order_by).desc().nulls_last()
+            order = column.desc().nulls_last()
         else: 
-            order = getattr(alias, queryParams.user_order_by).nulls_first()
-            
-        statement = select(alias).offset(queryParams.user_skip).limit(queryParams.user_limit).order_by(order)
-        if public_restricted:
-            statement = statement.where(alias.is_verified == True)
+            order = column.nulls_first()
             
-        db_objs = db.scalars(
-            statement
-        ).all()
+        statement = statement.order_by(order, User.id).limit(queryParams.user_limit)
+        if queryParams.user_cursor is not None:
+            return statement.where(
+                keyset_filter(
+                    column,
+                    User.id,
+                    queryParams.user_cursor,
+                    queryParams.user_order_by,
+                    queryParams.user_desc,
+                )
+            )
 
-        return [UserSchema.model_validate(db_obj) for db_obj in db_objs]
+        return statement.offset(queryParams.user_skip)
 
     def get_count(self, db: Session, queryParams: UserSearchParams, public_restricted: bool = True) -> int:
-        username_filter = self.filter_by_text(
-            db, queryParams.user_name, "username"
-        )
-        email_filter = self.filter_by_text(db, queryParams.user_email, "email")
-        full_name_filter = self.filter_by_text(
-            db, queryParams.user_full_name, "full_name"
-        )
-        
+        statement = self.build_search_query(queryParams, public_restricted)
+
+        count = db.execute(
+            select(func.count()).select_from(statement.subquery())
+        ).scalar()
+        return count if count else 0
+
+    def build_search_query(
+        self, queryParams: UserSearchParams, public_restricted: bool = True
+    ) -> Select:
+        filters = [
+            self.filter_by_text(queryParams.user_name, "username", queryParams.user_fuzzy),
+            self.filter_by_text(queryParams.user_email, "email"),
+            self.filter_by_text(queryParams.user_full_name, "full_name"),
+        ]
         if queryParams.user_skip_authors:
-            author_filter = self.filter_no_authors(db)
-            smt = username_filter.intersect(
-                email_filter, full_name_filter, author_filter
-            ).subquery()
-        else:
-            smt = username_filter.intersect(
-                email_filter, full_name_filter
-            ).subquery()
-            
-        alias = aliased(User, smt)
-        
-        statement = select(func.count()).select_from(alias)
+            filters.append(self.filter_no_authors())
         if public_restricted:
-            statement = statement.where(alias.is_verified == True)
-        count = db.execute(statement).scalar()
-        return count if count else 0
+            filters.append(User.is_verified == True)
+
+        return select(User).where(*[f for f in filters if f is not None])
 
-    def filter_by_text(self, db: Session, query: str, attr: str) -> Select:
-        return select(User).where(getattr(User, attr).icontains(query))
+    def filter_by_text(
+        self, query: str, attr: str, fuzzy: bool = False
+    ) -> Optional[ColumnElement[bool]]:
+        if query == "":
+            return None
+        if fuzzy:
+            return literal(query).op("<%")(getattr(User, attr))
+        return getattr(User, attr).icontains(query)
     
-    def filter_no_authors(self, db: Session) -> Select:
-        return select(User).where(User.author_id.is_(None))
+    def filter_no_authors(self) -> ColumnElement[bool]:
+        return User.author_id.is_(None)
 
-    def create(self, db: Session, obj_create: UserCreate) -> UserSchema:
+    def create(
+        self,
+        db: Session,
+        obj_create: UserCreate,
+        hashed_password: str,
+    ) -> UserSchema:
+        # Passwords are hashed by app.core.password_hasher, off the threads
+        # serving requests
         obj_data = obj_create.model_dump(exclude_none=True, exclude_unset=True)
-        obj_data["hashed_password"] = get_password_hash(obj_create.password)
+        obj_data["hashed_password"] = hashed_password
 
         db_schema = UserSchema.model_validate(obj_data)
         db_obj = User(**db_schema.model_dump(exclude_none=True, exclude_unset=True))
@@ -116,7 +196,11 @@ class UserCRUD:
         return UserSchema.model_validate(db_obj)
     
     def update(
-        self, db: Session, obj_id: uuid.UUID, obj_update: UserUpdate | UserUpdateMe
+        self,
+        db: Session,
+        obj_id: uuid.UUID,
+        obj_update: UserUpdate | UserUpdateMe,
+        hashed_password: Optional[str] = None,
     ) -> Optional[UserSchema]:
         db_obj = db.get(User, obj_id)
         if not db_obj:
@@ -125,7 +209,9 @@ class UserCRUD:
         user_data = obj_update.model_dump(exclude_unset=True)
 
         if "password" in user_data:
-            user_data["hashed_password"] = get_password_hash(user_data["password"])
+            if hashed_password is None:
+                raise ValueError("The new password has to be hashed beforehand")
+            user_data["hashed_password"] = hashed_password
             del user_data["password"]
             
 
@@ -141,6 +227,7 @@ class UserCRUD:
             db.commit()
             db.refresh(db_obj)
 
+        principal_cache.invalidate(db_obj.id)
         return UserSchema.model_validate(db_obj)
 
     def delete(self, db: Session, obj_id: uuid.UUID) -> None:  # type: ignore
@@ -159,20 +246,43 @@ class UserCRUD:
         
         db.delete(db_obj)
         db.commit()
+        principal_cache.invalidate(obj_id)
 
-    def authenticate(
+    async def authenticate(
         self, db: Session, email: str, password: str
     ) -> Optional[UserSchema]:
-        statement = select(User).where(User.email == email)
-        db_user = db.scalars(statement).first()
+        db_user = await run_in_threadpool(self.get_by_email, db, email)
 
         if not db_user:
             return None
 
-        if not verify_password(password, db_user.hashed_password):
+        verified, new_hash = await password_hasher.verify_and_update(
+            password, db_user.hashed_password
+        )
+        if not verified:
             return None
 
+        if new_hash is not None:
+            await run_in_threadpool(
+                self.upgrade_password_hash,
+                db,
+                db_user.id,
+                db_user.hashed_password,
+                new_hash,
+            )
+
         return db_user
 
+    def upgrade_password_hash(
+        self, db: Session, obj_id: uuid.UUID, old_hash: str, new_hash: str
+    ) -> None:
+        # Left as it is if the password changed since it was verified
+        db.execute(
+            update(User)
+            .where(User.id == obj_id, User.hashed_password == old_hash)
+            .values(hashed_password=new_hash)
+        )
+        db.commit()
+
 
 user_crud = UserCRUD()
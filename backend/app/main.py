@@ -1,10 +1,16 @@
+from typing import Any
+
 import sentry_sdk
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
 from fastapi.routing import APIRoute
 from starlette.middleware.cors import CORSMiddleware
 
 from app.api.api import api_router
 from app.core.config import settings
+from app.core.password_hasher import PasswordHasherBusy
+from app.core.query_stats import count_queries
+from app.core.responses import default_response_class
 from fastapi.staticfiles import StaticFiles
 
 import uvicorn
@@ -21,6 +27,7 @@ app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     generate_unique_id_function=custom_generate_unique_id,
+    default_response_class=default_response_class(),
 )
 
 app.mount("/static", StaticFiles(directory="images"), name="static")
@@ -35,7 +42,29 @@ if settings.all_cors_origins:
         allow_headers=["*"],
     )
 
+if settings.ENVIRONMENT != "production":
+
+    @app.middleware("http")
+    async def add_query_stats(request: Request, call_next: Any) -> Response:
+        with count_queries() as stats:
+            response = await call_next(request)
+
+        response.headers["X-Query-Count"] = str(stats.count)
+        response.headers["Server-Timing"] = f"db;dur={stats.seconds * 1000:.1f}"
+        return response
+
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(
+    request: Request, exc: PasswordHasherBusy
+) -> JSONResponse:
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many requests, try again later"},
+        headers={"Retry-After": "1"},
+    )
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
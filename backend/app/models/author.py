@@ -5,7 +5,7 @@ from datetime import datetime
 from app.core.base_class import Base
 
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, ForeignKey, Table, Column, Uuid
+from sqlalchemy import String, ForeignKey, Table, Column, Uuid, Index
 from sqlalchemy.ext.associationproxy import association_proxy, AssociationProxy
 
 author_poem = Table(
@@ -17,6 +17,14 @@ author_poem = Table(
 
 class Author(Base): 
     __tablename__ = "author"
+    __table_args__ = (
+        Index(
+            "ix_author_full_name_trgm",
+            "full_name",
+            postgresql_using="gin",
+            postgresql_ops={"full_name": "gin_trgm_ops"},
+        ),
+    )
             
     id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid.uuid4)
     full_name: Mapped[str] = mapped_column(String(255), unique=True, index=True)
@@ -1,7 +1,7 @@
 from typing import Optional, List
 import uuid
 from datetime import datetime
-from sqlalchemy import func, DateTime, String, Table, Column, ForeignKey, Uuid
+from sqlalchemy import func, DateTime, String, Table, Column, ForeignKey, Uuid, Index
 
 from app.core.base_class import Base
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -25,6 +25,14 @@ collection_poem = Table(
 
 class Collection(Base):
     __tablename__ = "collection"
+    __table_args__ = (
+        Index(
+            "ix_collection_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid.uuid4)
     name: Mapped[str] = mapped_column(String(255))
@@ -46,6 +54,7 @@ class Collection(Base):
     poems: Mapped[List["Poem"]] = relationship(  # type: ignore  # noqa: F821
         secondary="collection_poem",
         back_populates="collections",
+        order_by="Poem.title, Poem.id",
     )
     
     # proxies
@@ -1,23 +1,57 @@
 from typing import Optional, List
+import random
 import uuid
 from datetime import datetime
 
 from app.core.base_class import Base
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, ForeignKey, func, DateTime
+from sqlalchemy import String, ForeignKey, func, DateTime, Computed, Index, Float, text
+from sqlalchemy.dialects.postgresql import REGCONFIG, TSVECTOR
 from sqlalchemy.ext.associationproxy import association_proxy, AssociationProxy
     
 class Poem(Base): 
     __tablename__ = "poem"
+    __table_args__ = (
+        Index("ix_poem_search_vector", "search_vector", postgresql_using="gin"),
+        # Only public poems are picked by /poems/random
+        Index("ix_poem_random_key", "random_key", postgresql_where=text("is_public")),
+        Index(
+            "ix_poem_title_trgm",
+            "title",
+            postgresql_using="gin",
+            postgresql_ops={"title": "gin_trgm_ops"},
+        ),
+    )
     
     id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid.uuid4)
     title: Mapped[str] = mapped_column(String(255))
     content: Mapped[str]
+    # Rendered by app.render_queue after every change to the content
+    content_html: Mapped[Optional[str]] = mapped_column(deferred=True)
     description: Mapped[Optional[str]]
     is_public: Mapped[bool] = mapped_column(default=True)
     show_author: Mapped[bool] = mapped_column(default=True)
     
     language: Mapped[Optional[str]] = mapped_column(String(255))
+    num_verses: Mapped[int] = mapped_column(default=1, server_default="1", index=True)
+    random_key: Mapped[float] = mapped_column(
+        Float, default=random.random, server_default=func.random()
+    )
+
+    # Text search configuration derived from the language, see app.crud.poem
+    search_config: Mapped[str] = mapped_column(
+        REGCONFIG, default="simple", server_default="simple"
+    )
+    search_vector: Mapped[str] = mapped_column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector(search_config, coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector(search_config, coalesce(content, '')), 'B') || "
+            "setweight(to_tsvector(search_config, coalesce(description, '')), 'C')",
+            persisted=True,
+        ),
+        deferred=True,
+    )
     created_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
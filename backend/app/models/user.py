@@ -4,13 +4,22 @@ from datetime import datetime
 
 from pydantic import EmailStr
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import ForeignKey, String, func, DateTime
+from sqlalchemy import ForeignKey, String, func, DateTime, Index
 from sqlalchemy.ext.associationproxy import association_proxy, AssociationProxy
 
 from app.core.base_class import Base
 
 class User(Base):
     __tablename__ = "user"
+    __table_args__ = tuple(
+        Index(
+            f"ix_user_{column}_trgm",
+            column,
+            postgresql_using="gin",
+            postgresql_ops={column: "gin_trgm_ops"},
+        )
+        for column in ["username", "email", "full_name"]
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid.uuid4)
     email: Mapped[EmailStr] = mapped_column(String(255), unique=True, index=True)
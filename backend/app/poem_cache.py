@@ -0,0 +1,64 @@
+import hashlib
+import uuid
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional
+
+from app.core.config import settings
+from app.poem_parser import PoemParser, RenderTimeout
+
+
+class PoemRenderCache:
+    """
+    Bounded LRU store of rendered poems. Entries are keyed by poem id and
+    checked against a digest of the content, so an edited poem is never
+    served stale even if the cache was not invalidated.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._entries: OrderedDict[uuid.UUID, tuple[str, str]] = OrderedDict()
+        self._lock = Lock()
+
+    def render(self, poem_id: uuid.UUID, content: str) -> str:
+        # Plain text is not cached, the poem may render in time later
+        try:
+            return self.render_formatted(poem_id, content, settings.POEM_RENDER_TIMEOUT)
+        except RenderTimeout:
+            return PoemParser(content).to_plain_html()
+
+    def render_formatted(
+        self, poem_id: uuid.UUID, content: str, timeout: Optional[float]
+    ) -> str:
+        """
+        Same as render, but raises RenderTimeout instead of falling back to
+        plain text.
+        """
+        digest = hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+
+        with self._lock:
+            entry = self._entries.get(poem_id)
+            if entry and entry[0] == digest:
+                self._entries.move_to_end(poem_id)
+                return entry[1]
+
+        html = PoemParser(content, timeout=timeout).render()
+
+        with self._lock:
+            self._entries[poem_id] = (digest, html)
+            self._entries.move_to_end(poem_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+        return html
+
+    def invalidate(self, poem_id: uuid.UUID) -> None:
+        with self._lock:
+            self._entries.pop(poem_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+render_cache = PoemRenderCache(settings.POEM_RENDER_CACHE_SIZE)
@@ -1,44 +1,222 @@
+import html
 import re
+import time
+from bisect import bisect_left
+from typing import NamedTuple, Optional
 
 CESURA_SPACES = 10
+CESURA = "&nbsp;" * CESURA_SPACES
+
+# The passes run one after the other over the whole poem and later ones
+# match the tags written by earlier ones, so their order matters.
+CESURA_REGEX = re.compile(r"(^.*?)\/\/(.*?$)", flags=re.MULTILINE)
+STRONG_REGEX = re.compile(r"(?<!\\)\*\*(.*?)\*\*", flags=re.DOTALL)
+ITALIC_REGEX = re.compile(r"(?<!\\)\*(.*?)\*", flags=re.DOTALL)
+UNDERLINE_REGEX = re.compile(r"(?<!\\)_(.*?)_", flags=re.DOTALL)
+STRIKE_REGEX = re.compile(r"(?<!\\)~(.*?)~", flags=re.DOTALL)
+FONT_SIZE_REGEX = re.compile(r"(?<!\\)<([^<]*?)>\((\d+)\)", flags=re.DOTALL)
+INDENT_REGEX = re.compile(r"^(\d+)>(.*\n?)", flags=re.MULTILINE)
+ALIGN_REGEXES = {
+    align: re.compile(
+        rf"(?<!\\)<{align}>.?(.*?)(?=<center>|<right>|<left>|$)", flags=re.DOTALL
+    )
+    for align in ["center", "left", "right"]
+}
+RIGHT_BLOCK_REGEX = re.compile(
+    r'(<div style="text-align:right;">)(.*?)(?=<div style="text-align:|$)',
+    flags=re.DOTALL,
+)
+INDENT_BLOCK_REGEX = re.compile(
+    r'<div style="padding-left:(\d+)ch; margin:0;">(.*?)</div>', flags=re.DOTALL
+)
+
+
+class RenderTimeout(Exception):
+    pass
+
+
+class _Mark(NamedTuple):
+    start: int
+    end: int
+    text: str
+    content: str
+    color: Optional[str]
+
+    def to_html(self) -> str:
+        if self.color:
+            return f'<mark style="background-color:{self.color}!important;">{self.content}</mark>'
+
+        return f"<mark>{self.content}</mark>"
+
+
+def _positions(poem: str, char: str) -> list[int]:
+    return [match.start() for match in re.finditer(re.escape(char), poem)]
+
+
+def _mark_end(poem: str, closing: int, parens: list[int]) -> tuple[int, Optional[str]]:
+    # The color goes in parentheses right after the closing "="
+    if poem[closing + 1 : closing + 2] == "(":
+        index = bisect_left(parens, closing + 2)
+        if index < len(parens) and parens[index] > closing + 2:
+            return parens[index] + 1, poem[closing + 2 : parens[index]]
+
+    return closing + 1, None
+
+
+def _find_marks(poem: str) -> list[_Mark]:
+    """
+    Same matches as re.finditer(r"(?<!\\)=([^=]+)=(?:\(([^)]+)\))?", poem),
+    without scanning to the end of the poem for every "=(" that is never
+    closed.
+    """
+    equals = _positions(poem, "=")
+    parens = _positions(poem, ")")
+
+    marks: list[_Mark] = []
+    end = 0
+    for start, closing in zip(equals, equals[1:]):
+        if start < end or closing == start + 1 or poem[start - 1 : start] == "\\":
+            continue
+
+        end, color = _mark_end(poem, closing, parens)
+        marks.append(
+            _Mark(start, end, poem[start:end], poem[start + 1 : closing], color)
+        )
+
+    return marks
+
+
+def _replacements_are_stable(marks: list[_Mark]) -> bool:
+    """
+    Whether replacing a mark can never create a new copy of a highlighted
+    text, either inside the HTML or where it joins the text around it.
+    """
+    return not any(
+        (mark.color and "=" in mark.color)
+        or "<mark" in mark.text
+        or '"background-color:' in mark.text
+        for mark in marks
+    )
+
+
+def _marks_are_isolated(poem: str, marks: list[_Mark]) -> bool:
+    """
+    Whether replacing every highlighted text with str.replace, one after
+    the other, only replaces the marks themselves.
+    """
+    if not _replacements_are_stable(marks):
+        return False
+
+    # Position of each text in the order they are replaced
+    ranks: dict[str, int] = {}
+    for mark in marks:
+        ranks.setdefault(mark.text, len(ranks))
+
+    equals = _positions(poem, "=")
+    parens = _positions(poem, ")")
+    by_start = {mark.start: mark for mark in marks}
+    by_closing = {mark.start + len(mark.content) + 1: mark for mark in marks}
+
+    # Every place where a text shows up: escaped, overlapping or matched
+    occurrences: dict[str, list[tuple[int, int, int]]] = {text: [] for text in ranks}
+    for index, (start, closing) in enumerate(zip(equals, equals[1:])):
+        if closing == start + 1:
+            continue
+
+        candidates = [(poem[start : closing + 1], closing + 1)]
+        end, color = _mark_end(poem, closing, parens)
+        if color and (index + 2 == len(equals) or equals[index + 2] >= end):
+            candidates.append((poem[start:end], end))
+
+        for text, end in candidates:
+            if text in occurrences:
+                occurrences[text].append((start, closing, end))
+
+    # str.replace goes left to right skipping overlapping occurrences, and
+    # occurrences overlapping an already replaced text are gone
+    for text, rank in ranks.items():
+        last_end = 0
+        for start, closing, end in occurrences[text]:
+            if start < last_end:
+                continue
+
+            overlapping = [by_start.get(start), by_start.get(closing), by_closing.get(start)]
+            if any(mark and ranks[mark.text] < rank for mark in overlapping):
+                continue
+
+            mark = by_start.get(start)
+            if mark is None or mark.text != text:
+                return False
+
+            last_end = end
+
+    return True
+
 
 class PoemParser:
-    def __init__(self, content: str) -> None:
+    def __init__(self, content: str, timeout: Optional[float] = None) -> None:
         self.content = content
         self.indent_count = 0
         self.is_aligned = False
+        self.deadline = time.monotonic() + timeout if timeout is not None else None
+
+    def _check_timeout(self) -> None:
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise RenderTimeout()
 
     def _parse_word_format(self, poem: str) -> str:
-        poem = re.sub(
-            r"(?<!\\)\*\*(.*?)\*\*", r"<strong>\1</strong>", poem, flags=re.DOTALL
-        )
-        poem = re.sub(
-            r"(?<!\\)\*(.*?)\*", r"<i>\1</i>", poem, flags=re.DOTALL
-        )
-        poem = re.sub(r"(?<!\\)_(.*?)_", r"<u>\1</u>", poem, flags=re.DOTALL)
-        poem = re.sub(r"(?<!\\)~(.*?)~", r"<s>\1</s>", poem, flags=re.DOTALL)
-        
-        matches = re.finditer(r"(?<!\\)=([^=]+)=(?:\(([^)]+)\))?", poem, flags=re.DOTALL | re.MULTILINE)
-        for match in matches: 
-            content = match.group(1)
-            if match.group(2):
-                color = match.group(2)
-                poem = poem.replace(match.group(0), f'<mark style="background-color:{color}!important;">{content}</mark>')
-            else:
-                poem = poem.replace(match.group(0), f'<mark>{content}</mark>')
-                
+        for regex, sub in [
+            (STRONG_REGEX, r"<strong>\1</strong>"),
+            (ITALIC_REGEX, r"<i>\1</i>"),
+            (UNDERLINE_REGEX, r"<u>\1</u>"),
+            (STRIKE_REGEX, r"<s>\1</s>"),
+        ]:
+            self._check_timeout()
+            poem = regex.sub(sub, poem)
+
+        self._check_timeout()
+        return self._parse_marks(poem)
+
+    def _parse_marks(self, poem: str) -> str:
+        marks = _find_marks(poem)
+        if not marks:
+            return poem
+
+        # Every highlighted text used to be replaced with str.replace, which
+        # also replaces any other place where the same text shows up. When
+        # that cannot happen the marks are replaced in a single pass.
+        if not _marks_are_isolated(poem, marks):
+            return self._replace_marks(poem, marks)
+
+        parts = []
+        end = 0
+        for mark in marks:
+            parts += [poem[end : mark.start], mark.to_html()]
+            end = mark.end
+
+        parts.append(poem[end:])
+        return "".join(parts)
+
+    def _replace_marks(self, poem: str, marks: list[_Mark]) -> str:
+        # Once replaced, a text only shows up again if a later replacement
+        # brings it back
+        if _replacements_are_stable(marks):
+            marks = list({mark.text: mark for mark in marks}.values())
+
+        for mark in marks:
+            self._check_timeout()
+            poem = poem.replace(mark.text, mark.to_html())
+
         return poem
 
     def _parse_text_align(self, poem: str) -> str:
         align_count = 0
         for align in ["center", "left"]:
-            regex = rf"(?<!\\)<{align}>.?(.*?)(?=<center>|<right>|<left>|$)"
             sub = rf'<div style="text-align:{align};">\1</div>'
-            poem, align_count = re.subn(regex, sub, poem, flags=re.DOTALL)
+            poem, align_count = ALIGN_REGEXES[align].subn(sub, poem)
 
-        right_regex = r"(?<!\\)<right>.?(.*?)(?=<center>|<right>|<left>|$)"
         sub = r'<div style="text-align:right;">\1</div>'
-        poem, right_align_count = re.subn(right_regex, sub, poem, flags=re.DOTALL)
+        poem, right_align_count = ALIGN_REGEXES["right"].subn(sub, poem)
 
         if right_align_count > 0 and self.indent_count > 0:
             poem = self._adjust_indentation_right_align(poem)
@@ -49,67 +227,79 @@ class PoemParser:
         return poem
 
     def _adjust_indentation_right_align(self, poem: str) -> str:
-        pattern = r'(<div style="text-align:right;">)(.*?)(?=<div style="text-align:|$)'
-        
         def replace_right_block(match):
             opening_tag = match.group(1)
             content = match.group(2)
-            
-            modified_content = re.sub(
-                r'<div style="padding-left:(\d+)ch; margin:0;">(.*?)</div>',
+            self._check_timeout()
+
+            # Openings after the last </div> cannot match, and looking for
+            # their closing tag would scan to the end once for each of them
+            last = content.rfind("</div>")
+            if last == -1:
+                return opening_tag + content
+
+            last += len("</div>")
+            modified_content = INDENT_BLOCK_REGEX.sub(
                 r'<div style="padding-right:\1ch; margin:0; text-align:right;">\2</div>',
-                content,
-                flags=re.DOTALL
+                content[:last],
             )
             
-            return opening_tag + modified_content
+            return opening_tag + modified_content + content[last:]
         
-        poem = re.sub(pattern, replace_right_block, poem, flags=re.DOTALL)
+        poem = RIGHT_BLOCK_REGEX.sub(replace_right_block, poem)
         return poem
 
     def _parse_font_size(self, poem: str) -> str:
-        poem = re.sub(
-            r"(?<!\\)<([^<]*?)>\((\d+)\)",
-            r'<span style="font-size:\2px;">\1</span>',
-            poem,
-            flags=re.DOTALL,
-        )
+        poem = FONT_SIZE_REGEX.sub(r'<span style="font-size:\2px;">\1</span>', poem)
         return poem
 
     def _parse_indentation(self, poem: str) -> str:
         # Here I am also capturing the newline in the regex, because otherwise
         # the later <br> would add an extra line break.
-        poem, self.indent_count = re.subn(
-            r"^(\d+)>(.*\n?)",
-            r'<div style="padding-left:\1ch; margin:0;">\2</div>',
-            poem,
-            flags=re.MULTILINE,
+        poem, self.indent_count = INDENT_REGEX.subn(
+            r'<div style="padding-left:\1ch; margin:0;">\2</div>', poem
         )
             
         return poem
 
     def _parse_cesura(self, poem: str) -> str:
         # For the cesura I have chosen to implement it using a fixed number of spaces
-        cesura = "&nbsp;" * CESURA_SPACES
-        poem = re.sub(
-            r"(^.*?)\/\/(.*?$)",
-            fr"\1{cesura}\2",
-            poem,
-            flags=re.MULTILINE,
-        )
+        poem = CESURA_REGEX.sub(rf"\1{CESURA}\2", poem)
         return poem
 
+    def to_plain_html(self) -> str:
+        poem = html.escape(self.content).replace("\n", "<br>")
+        return '<div style="text-align: center;">' + poem + "</div>"
+
     def to_html(self) -> str:
+        """
+        Every pass takes linear time. With a timeout the time is checked
+        between passes, and the poem is rendered as plain text once it runs
+        out.
+        """
+        try:
+            return self.render()
+        except RenderTimeout:
+            return self.to_plain_html()
+
+    def render(self) -> str:
+        """
+        Same as to_html, but raises RenderTimeout when the time runs out.
+        """
         poem = self.content
 
-        poem = self._parse_cesura(poem)
-        poem = self._parse_word_format(poem)
-        poem = self._parse_font_size(poem)
-        poem = self._parse_indentation(poem)
-        poem = self._parse_text_align(poem)
+        for parse in [
+            self._parse_cesura,
+            self._parse_word_format,
+            self._parse_font_size,
+            self._parse_indentation,
+            self._parse_text_align,
+        ]:
+            self._check_timeout()
+            poem = parse(poem)
 
         # Line breaks
-        poem = re.sub(r"\n", "<br>", poem)
+        poem = poem.replace("\n", "<br>")
 
         if not self.is_aligned:
             return '<div style="text-align: center;">' + poem + "</div>"
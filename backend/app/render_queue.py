@@ -0,0 +1,71 @@
+import logging
+import uuid
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from contextlib import AbstractContextManager
+from typing import Callable
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.db import engine
+from app.models.poem import Poem
+from app.poem_cache import render_cache
+from app.poem_parser import RenderTimeout
+
+
+logger = logging.getLogger(__name__)
+
+
+class RenderQueue:
+    """
+    Renders poems in the background after they are written and stores the
+    HTML with them, so reading a poem does not have to parse it. Jobs run
+    on the executor, which can be replaced by any other implementation of
+    concurrent.futures.Executor.
+    """
+
+    def __init__(
+        self,
+        executor: Executor,
+        session_factory: Callable[[], AbstractContextManager[Session]],
+    ) -> None:
+        self.executor = executor
+        self.session_factory = session_factory
+
+    def submit(self, poem_id: uuid.UUID, content: str) -> Future[None]:
+        return self.executor.submit(self._render, poem_id, content)
+
+    def shutdown(self) -> None:
+        # Waits for the poems already submitted to be rendered
+        self.executor.shutdown(wait=True)
+
+    def _render(self, poem_id: uuid.UUID, content: str) -> None:
+        try:
+            html = render_cache.render_formatted(
+                poem_id, content, settings.POEM_RENDER_BACKGROUND_TIMEOUT
+            )
+        except RenderTimeout:
+            # Plain text is not stored, the poem is rendered when it is read
+            logger.warning(f"Poem {poem_id} took too long to render")
+            return
+
+        try:
+            with self.session_factory() as session:
+                # Nothing is stored if the poem changed in the meantime
+                session.execute(
+                    update(Poem)
+                    .where(Poem.id == poem_id, Poem.content == content)
+                    .values(content_html=html, updated_at=Poem.updated_at)
+                )
+                session.commit()
+        except Exception:
+            logger.exception(f"Could not render poem {poem_id}")
+
+
+render_queue = RenderQueue(
+    ThreadPoolExecutor(
+        max_workers=settings.POEM_RENDER_WORKERS, thread_name_prefix="poem-render"
+    ),
+    lambda: Session(engine),
+)
@@ -1,8 +1,10 @@
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, model_validator
 from typing import Literal, Optional, List
+from typing_extensions import Self
 import uuid
 from datetime import datetime
 
+from app.core.pagination import decode_cursor
 from app.schemas.poem import PoemPublic
 
 AuthorParam = Literal["full_name", "birth_date", "poems", "death_date"]
@@ -17,6 +19,24 @@ class AuthorSearchParams(BaseModel):
     author_death_date: str = ""
     author_poems: str = ""
     author_basic: bool = True
+    author_fuzzy: bool = False
+    author_cursor: Optional[str] = None
+
+    def cursor_order_by(self) -> Optional[str]:
+        if self.author_order_by == "poems" or (
+            self.author_fuzzy and self.author_full_name != ""
+        ):
+            return None
+        return self.author_order_by
+
+    @model_validator(mode="after")
+    def _check_cursor(self) -> Self:
+        if self.author_cursor is not None:
+            order_by = self.cursor_order_by()
+            if order_by is None:
+                raise ValueError("Cursors are not supported with this ordering")
+            decode_cursor(self.author_cursor, order_by)
+        return self
 
 
 class AuthorBase(BaseModel):
@@ -66,8 +86,10 @@ class AuthorPublicWithPoems(AuthorPublic):
 class AuthorsPublic(BaseModel):
     data: list[AuthorPublic]
     count: int
+    next_cursor: Optional[str] = None
 
 
 class AuthorsPublicWithPoems(BaseModel):
     data: list[AuthorPublicWithPoems]
     count: int
+    next_cursor: Optional[str] = None
@@ -0,0 +1,57 @@
+from pydantic import BaseModel, Field, TypeAdapter, model_validator
+from typing import Annotated, Literal, Optional, Union
+from typing_extensions import Self
+import uuid
+
+from app.schemas.author import AuthorCreate
+from app.schemas.collection import CollectionCreate
+from app.schemas.poem import PoemCreate
+from app.schemas.user import UserBase
+
+
+# Records of the bulk import, one per line of NDJSON. Ids can be given so
+# later records can refer to earlier ones.
+
+class AuthorImport(AuthorCreate):
+    entity: Literal["author"]
+    id: uuid.UUID = Field(default_factory=uuid.uuid4)
+
+
+class UserImport(UserBase):
+    entity: Literal["user"]
+    id: uuid.UUID = Field(default_factory=uuid.uuid4)
+    password: Optional[str] = Field(min_length=8, max_length=40, default=None)
+    hashed_password: Optional[str] = None
+    author_name: Optional[str] = None
+
+    @model_validator(mode="after")
+    def _check_password(self) -> Self:
+        if (self.password is None) == (self.hashed_password is None):
+            raise ValueError("Either password or hashed_password is required")
+        return self
+
+
+class PoemImport(PoemCreate):
+    entity: Literal["poem"]
+    id: uuid.UUID = Field(default_factory=uuid.uuid4)
+
+
+class CollectionImport(CollectionCreate):
+    entity: Literal["collection"]
+    id: uuid.UUID = Field(default_factory=uuid.uuid4)
+    user_id: uuid.UUID  # type: ignore
+
+
+ImportRecord = Annotated[
+    Union[AuthorImport, UserImport, PoemImport, CollectionImport],
+    Field(discriminator="entity"),
+]
+import_record_adapter: TypeAdapter[ImportRecord] = TypeAdapter(ImportRecord)
+import_records_adapter: TypeAdapter[list[ImportRecord]] = TypeAdapter(list[ImportRecord])
+
+
+class ImportResult(BaseModel):
+    rows: dict[str, int]
+    skipped: int
+    seconds: float
+    rows_per_second: float
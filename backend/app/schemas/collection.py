@@ -1,10 +1,12 @@
 from __future__ import annotations
 
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, model_validator
 from typing import Optional, List, Literal
+from typing_extensions import Self
 import uuid
 from datetime import datetime
 
+from app.core.pagination import decode_cursor
 from app.schemas.poem import PoemPublic
 
 
@@ -14,6 +16,22 @@ class CollectionSearchParams(BaseModel):
     collection_desc: bool = False
     collection_name: str = ""
     collection_basic: bool = True
+    collection_fuzzy: bool = False
+    collection_cursor: Optional[str] = None
+
+    def cursor_order_by(self) -> Optional[str]:
+        if self.collection_fuzzy and self.collection_name != "":
+            return None
+        return "name"
+
+    @model_validator(mode="after")
+    def _check_cursor(self) -> Self:
+        if self.collection_cursor is not None:
+            order_by = self.cursor_order_by()
+            if order_by is None:
+                raise ValueError("Cursors are not supported with this ordering")
+            decode_cursor(self.collection_cursor, order_by)
+        return self
 
 
 class CollectionBase(BaseModel):
@@ -67,4 +85,5 @@ class CollectionPublicWithPoems(CollectionPublic):
 class CollectionsPublic(BaseModel):
     count: int
     data: List[CollectionPublicWithPoems]
+    next_cursor: Optional[str] = None
     
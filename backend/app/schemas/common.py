@@ -1,5 +1,10 @@
+from typing import TypeVar
+
 from pydantic import BaseModel
 
 
+SchemaT = TypeVar("SchemaT", bound=BaseModel)
+
+
 class Message(BaseModel):
     message: str
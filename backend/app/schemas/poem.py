@@ -1,12 +1,15 @@
 from __future__ import annotations
 
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, model_validator
 from typing import Literal, Optional, List
+from typing_extensions import Self
 import uuid
 from datetime import datetime
 from enum import Enum
 
-PoemParam = Literal["created_at", "updated_at", "title"]
+from app.core.pagination import decode_cursor
+
+PoemParam = Literal["created_at", "updated_at", "title", "rank"]
 PoemParamType = Literal["all", "version",
                         "translation", "derived", "original", ""]
 
@@ -24,6 +27,29 @@ class PoemSearchParams(BaseModel):
     poem_language: str = ""
     poem_basic: bool = True
     poem_author: str = ""
+    poem_query: str = ""
+    poem_fuzzy: bool = False
+    poem_cursor: Optional[str] = None
+
+    def cursor_order_by(self) -> Optional[str]:
+        if self.poem_order_by == "rank" or (self.poem_fuzzy and self.poem_title != ""):
+            return None
+        return self.poem_order_by
+
+    @model_validator(mode="after")
+    def _check_rank(self) -> Self:
+        if self.poem_order_by == "rank" and self.poem_query == "":
+            raise ValueError("Ordering by rank requires a poem_query")
+        return self
+
+    @model_validator(mode="after")
+    def _check_cursor(self) -> Self:
+        if self.poem_cursor is not None:
+            order_by = self.cursor_order_by()
+            if order_by is None:
+                raise ValueError("Cursors are not supported with this ordering")
+            decode_cursor(self.poem_cursor, order_by)
+        return self
 
 
 class PoemBase(BaseModel):
@@ -93,15 +119,20 @@ class PoemSchema(PoemBase):
     derived_poems: List[PoemPublic] = []
     original: Optional[PoemPublic] = None
 
+    # Stored HTML of the content, only loaded by PoemCRUD.get_by_id
+    rendered_content: Optional[str] = None
+
 
 class PoemsPublicWithAllTheInfo(BaseModel):
     data: List[PoemPublicWithAllTheInfo]
     count: int
+    next_cursor: Optional[str] = None
 
 
 class PoemsPublic(BaseModel):
     data: List[PoemPublic]
     count: int
+    next_cursor: Optional[str] = None
 
 
 class PoemType(Enum):
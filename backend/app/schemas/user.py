@@ -1,9 +1,10 @@
-from pydantic import BaseModel, Field, EmailStr, ConfigDict
+from pydantic import BaseModel, Field, EmailStr, ConfigDict, model_validator
 from typing import Optional, Literal
+from typing_extensions import Self
 import uuid
 from datetime import datetime
 
-from app.crud import author
+from app.core.pagination import decode_cursor
 from app.schemas.author import AuthorPublic
 from app.schemas.collection import CollectionPublic
 
@@ -20,6 +21,22 @@ class UserSearchParams(BaseModel):
     user_full_name: str = ""
     user_basic: bool = True
     user_skip_authors: bool = False
+    user_fuzzy: bool = False
+    user_cursor: Optional[str] = None
+
+    def cursor_order_by(self) -> Optional[str]:
+        if self.user_fuzzy and self.user_name != "":
+            return None
+        return self.user_order_by
+
+    @model_validator(mode="after")
+    def _check_cursor(self) -> Self:
+        if self.user_cursor is not None:
+            order_by = self.cursor_order_by()
+            if order_by is None:
+                raise ValueError("Cursors are not supported with this ordering")
+            decode_cursor(self.user_cursor, order_by)
+        return self
 
 
 class UserBase(BaseModel):
@@ -90,9 +107,34 @@ class UserSchema(UserBase):
     collections: list[CollectionPublic] = []
 
 
+class UserPrincipal:
+    """
+    What the permission checks need to know about the current user. It is
+    built on every authenticated request, so it is a plain class loaded
+    from four columns instead of a full UserSchema.
+    """
+    __slots__ = ("id", "author_id", "is_superuser", "is_verified")
+
+    def __init__(
+        self,
+        id: uuid.UUID,
+        author_id: Optional[uuid.UUID],
+        is_superuser: bool,
+        is_verified: bool,
+    ) -> None:
+        self.id = id
+        self.author_id = author_id
+        self.is_superuser = is_superuser
+        self.is_verified = is_verified
+
+    def __repr__(self) -> str:
+        return f"UserPrincipal(id={self.id!r}, author_id={self.author_id!r})"
+
+
 class UsersPublic(BaseModel):
     data: list[UserPublic]
     count: int
+    next_cursor: Optional[str] = None
 
 
 class UserPublicBasic(BaseModel):
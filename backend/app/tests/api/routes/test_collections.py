@@ -1,12 +1,14 @@
 import uuid
+from typing import Callable
 
 from fastapi.testclient import TestClient
+from httpx import Response
 from sqlalchemy.orm import Session
 from app.core.config import settings
 from fastapi.encoders import jsonable_encoder
 from app.crud.user import user_crud
 from app.crud.collection import collection_crud
-from app.schemas.collection import CollectionUpdate
+from app.schemas.collection import CollectionCreate, CollectionUpdate
 from app.schemas.author import AuthorSchema
 from app.tests.utils.author import create_random_author
 from app.tests.utils.user import authentication_token_from_email, create_random_user
@@ -739,3 +741,34 @@ def test_delete_collection_without_privileges(
     )
     assert r.status_code == 403
     assert r.json()["detail"] == "The user doesn't have enough privileges"
+
+
+def test_read_collection_query_count(
+    client: TestClient,
+    normal_user_token_headers: dict[str, str],
+    db: Session,
+    assert_max_queries: Callable[[Response, int], None],
+) -> None:
+    user = create_random_user(db)
+    author = create_random_author(db)
+    poems = [create_random_poem(db, author_names=[author.full_name]) for _ in range(5)]
+    collection = collection_crud.create(
+        db,
+        CollectionCreate(
+            name=random_lower_string(),
+            user_id=user.id,
+            poem_ids=[poem.id for poem in poems],
+        ),
+    )
+    assert collection
+
+    client.get(f"{settings.API_V1_STR}/poems/random", headers=normal_user_token_headers)
+    # Requests share the test session, start it empty as it would be
+    db.expunge_all()
+    r = client.get(
+        f"{settings.API_V1_STR}/collections/{collection.id}",
+        headers=normal_user_token_headers,
+    )
+    assert r.status_code == 200
+    assert len(r.json()["poems"]) == 5
+    assert_max_queries(r, 3)
@@ -1,10 +1,13 @@
 from unittest.mock import patch
 
+import pytest
 from fastapi.testclient import TestClient
+from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
-from app.core.security import verify_password
+from app.core.password_hasher import password_hasher
+from app.core.security import get_password_hash, pwd_context, verify_password
 from app.crud.user import user_crud
 from app.utils import generate_temporary_token
 from app.schemas.user import UserUpdate, UserCreate
@@ -54,6 +57,60 @@ def test_get_access_token_incorrect_password(client: TestClient) -> None:
     assert r.status_code == 400
 
 
+def test_get_access_token_hasher_busy(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(password_hasher, "max_pending", 0)
+    login_data = {
+        "username": settings.FIRST_SUPERUSER,
+        "password": settings.FIRST_SUPERUSER_PASSWORD,
+    }
+    r = client.post(f"{settings.API_V1_STR}/login/access-token", data=login_data)
+    assert r.status_code == 503
+    assert r.headers["Retry-After"] == "1"
+
+
+def test_get_access_token_counted_in_metrics(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    before = password_hasher.stats()
+    login_data = {
+        "username": settings.FIRST_SUPERUSER,
+        "password": settings.FIRST_SUPERUSER_PASSWORD,
+    }
+    r = client.post(f"{settings.API_V1_STR}/login/access-token", data=login_data)
+    assert r.status_code == 200
+
+    r = client.get(
+        f"{settings.API_V1_STR}/utils/metrics/", headers=superuser_token_headers
+    )
+    assert r.status_code == 200
+    stats = r.json()["password_hasher"]
+    assert stats["completed"] == before["completed"] + 1
+    assert stats["queued"] == 0
+    assert stats["running"] == 0
+
+
+def test_get_access_token_upgrades_password_hash(
+    client: TestClient, db: Session
+) -> None:
+    password = random_lower_string()
+    user = create_random_user(db)
+    legacy_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash(password)
+    user_crud.upgrade_password_hash(db, user.id, user.hashed_password, legacy_hash)
+    assert pwd_context.needs_update(legacy_hash)
+
+    login_data = {"username": user.email, "password": password}
+    r = client.post(f"{settings.API_V1_STR}/login/access-token", data=login_data)
+    assert r.status_code == 200
+
+    db_user = user_crud.get_by_id(db, user.id)
+    assert db_user
+    assert db_user.hashed_password != legacy_hash
+    assert not pwd_context.needs_update(db_user.hashed_password)
+    assert verify_password(password, db_user.hashed_password)
+
+
 def test_get_access_token_inactive_user(client: TestClient, db: Session) -> None:
     email = random_email()
     password = random_lower_string()
@@ -61,7 +118,9 @@ def test_get_access_token_inactive_user(client: TestClient, db: Session) -> None
     user_create = UserCreate(
         email=email, password=password, is_active=False, username=username
     )
-    user_crud.create(db, obj_create=user_create)
+    user_crud.create(
+        db, obj_create=user_create, hashed_password=get_password_hash(password)
+    )
 
     login_data = {
         "username": email,
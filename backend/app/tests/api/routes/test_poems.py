@@ -1,6 +1,14 @@
+import asyncio
+import base64
+import json
 import uuid
+from typing import Any, Callable, Optional
 
+import pytest
 from fastapi.testclient import TestClient
+from httpx import Response
+from sqlalchemy import Engine, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
@@ -10,11 +18,14 @@ from app.tests.utils.user import authentication_token_from_email
 from app.tests.utils.utils import random_lower_string
 from app.tests.utils.author import create_random_author
 from app.tests.utils.user import create_random_user
-from app.schemas.poem import PoemType
+from app.schemas.poem import PoemCreate, PoemSchema, PoemType
 from app.schemas.author import AuthorSchema
 
+from app.backfill_data import backfill_content_html
 from app.poem_parser import PoemParser
 from app.crud.poem import poem_crud
+from app.models.poem import Poem
+from app.render_queue import render_queue
 
 # READ POEMS
 
@@ -53,6 +64,89 @@ def test_read_poems_as_superuser(
         assert "title" in item
 
 
+def test_read_poems_with_cursor(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    poem_ids = {str(create_random_poem(db).id) for _ in range(5)}
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+
+        response = client.get(
+            f"{settings.API_V1_STR}/poems",
+            headers=superuser_token_headers,
+            params=params,
+        )
+        assert response.status_code == 200
+        content = response.json()
+        assert content["count"] == 5
+        seen += [item["id"] for item in content["data"]]
+
+        cursor = content["next_cursor"]
+        if not cursor:
+            break
+
+    assert len(seen) == 5
+    assert set(seen) == poem_ids
+
+
+def test_read_poems_invalid_cursor(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    response = client.get(
+        f"{settings.API_V1_STR}/poems",
+        headers=superuser_token_headers,
+        params={"cursor": "not-a-cursor"},
+    )
+    assert response.status_code == 400
+
+
+def encode_test_cursor(data: dict[str, Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        {"value": "a", "id": str(uuid.uuid4())},
+        {"order_by": "title", "value": 1, "id": str(uuid.uuid4())},
+        {"order_by": "title", "value": {"datetime": "2024-05-01"}, "id": str(uuid.uuid4())},
+        {"order_by": "title", "value": "a", "id": "not-an-id"},
+        {"order_by": "title", "value": "a", "id": 1},
+    ],
+)
+def test_read_poems_malformed_cursor(
+    client: TestClient, superuser_token_headers: dict[str, str], data: dict[str, Any]
+) -> None:
+    response = client.get(
+        f"{settings.API_V1_STR}/poems",
+        headers=superuser_token_headers,
+        params={"cursor": encode_test_cursor(data)},
+    )
+    assert response.status_code == 400
+
+
+def test_search_poems_cursor_value_not_a_datetime(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    cursor = encode_test_cursor(
+        {"order_by": "created_at", "value": "yesterday", "id": str(uuid.uuid4())}
+    )
+    response = client.post(
+        f"{settings.API_V1_STR}/search",
+        headers=superuser_token_headers,
+        json={
+            "search_type": ["poem"],
+            "poem_params": {"poem_order_by": "created_at", "poem_cursor": cursor},
+        },
+    )
+    assert response.status_code == 422
+
+
 # READ POEM
 
 
@@ -275,6 +369,99 @@ def test_read_poem_parse_content_as_normal_user(
     assert content["title"] == poem.title
     assert content["content"] == PoemParser(poem.content).to_html()
 
+
+def test_read_poem_parse_content_after_update(
+    client: TestClient, db: Session, superuser_token_headers: dict[str, str]
+) -> None:
+    poem = create_random_poem(db, is_public=True)
+
+    response = client.get(
+        f"{settings.API_V1_STR}/poems/{poem.id}?parse=true",
+        headers=superuser_token_headers,
+    )
+    assert response.status_code == 200
+    assert response.json()["content"] == PoemParser(poem.content).to_html()
+
+    new_content = random_lower_string()
+    response = client.put(
+        f"{settings.API_V1_STR}/poems/{poem.id}",
+        headers=superuser_token_headers,
+        json={"content": new_content},
+    )
+    assert response.status_code == 200
+
+    response = client.get(
+        f"{settings.API_V1_STR}/poems/{poem.id}?parse=true",
+        headers=superuser_token_headers,
+    )
+    assert response.status_code == 200
+    assert response.json()["content"] == PoemParser(new_content).to_html()
+
+
+def test_read_poem_rendered_at_write_time(
+    client: TestClient, db: Session, superuser_token_headers: dict[str, str]
+) -> None:
+    poem = create_random_poem(db, is_public=True)
+    html = PoemParser(poem.content).to_html()
+    assert db.scalar(select(Poem.content_html).where(Poem.id == poem.id)) == html
+
+    new_content = random_lower_string()
+    response = client.put(
+        f"{settings.API_V1_STR}/poems/{poem.id}",
+        headers=superuser_token_headers,
+        json={"content": new_content},
+    )
+    assert response.status_code == 200
+
+    # A job for the old content finishing late does not overwrite the new one
+    render_queue.submit(poem.id, poem.content)
+    new_html = PoemParser(new_content).to_html()
+    assert db.scalar(select(Poem.content_html).where(Poem.id == poem.id)) == new_html
+
+
+def test_read_poem_not_rendered_yet(
+    client: TestClient, db: Session, normal_user_token_headers: dict[str, str]
+) -> None:
+    poem = create_random_poem(db, is_public=True)
+    db.execute(update(Poem).where(Poem.id == poem.id).values(content_html=None))
+
+    response = client.get(
+        f"{settings.API_V1_STR}/poems/{poem.id}?parse=true",
+        headers=normal_user_token_headers,
+    )
+    assert response.status_code == 200
+    assert response.json()["content"] == PoemParser(poem.content).to_html()
+
+
+def test_read_poem_render_timeout_not_stored(
+    client: TestClient,
+    db: Session,
+    normal_user_token_headers: dict[str, str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(settings, "POEM_RENDER_TIMEOUT", -1)
+    monkeypatch.setattr(settings, "POEM_RENDER_BACKGROUND_TIMEOUT", -1)
+    poem = poem_crud.create(
+        db, PoemCreate(title=random_lower_string(), content="**Con diez cañones**")
+    )
+    assert poem
+
+    # Neither the render queue nor the backfill store the plain text
+    assert db.scalar(select(Poem.content_html).where(Poem.id == poem.id)) is None
+    backfill_content_html(db)
+    assert db.scalar(select(Poem.content_html).where(Poem.id == poem.id)) is None
+
+    url = f"{settings.API_V1_STR}/poems/{poem.id}?parse=true"
+    response = client.get(url, headers=normal_user_token_headers)
+    assert response.status_code == 200
+    assert response.json()["content"] == PoemParser(poem.content).to_plain_html()
+
+    # Nor is it cached, the poem is formatted once it renders in time
+    monkeypatch.setattr(settings, "POEM_RENDER_TIMEOUT", 1.0)
+    response = client.get(url, headers=normal_user_token_headers)
+    assert response.json()["content"] == PoemParser(poem.content).to_html()
+    assert "<strong>" in response.json()["content"]
+
 # RANDOM 
 
 def test_read_random_poem_as_admin(
@@ -306,6 +493,42 @@ def test_read_random_not_found(
     assert content["detail"] == "No poem found"
 
 
+def test_read_random_poem_skips_private_poems(
+    client: TestClient, db: Session, normal_user_token_headers: dict[str, str]
+) -> None:
+    poem = create_random_poem(db, is_public=True)
+    for _ in range(5):
+        create_random_poem(db, is_public=False)
+
+    for _ in range(5):
+        response = client.get(
+            f"{settings.API_V1_STR}/poems/random",
+            headers=normal_user_token_headers,
+        )
+        assert response.status_code == 200
+        assert response.json()["id"] == str(poem.id)
+
+
+def test_read_daily_poem(
+    client: TestClient, db: Session, normal_user_token_headers: dict[str, str]
+) -> None:
+    for _ in range(5):
+        create_random_poem(db, is_public=True)
+
+    response = client.get(
+        f"{settings.API_V1_STR}/poems/daily",
+        headers=normal_user_token_headers,
+    )
+    assert response.status_code == 200
+    assert "max-age" in response.headers["Cache-Control"]
+
+    again = client.get(
+        f"{settings.API_V1_STR}/poems/daily",
+        headers=normal_user_token_headers,
+    )
+    assert again.json()["id"] == response.json()["id"]
+
+
 def test_read_random_anonymus_poem_as_normal_user(
     client: TestClient, db: Session, normal_user_token_headers: dict[str, str]
 ) -> None:
@@ -735,3 +958,81 @@ def test_delete_poem_not_enough_permissions(
     content = response.json()
     assert content["detail"] == "Not enough permissions"
 
+
+
+def test_read_poem_async_session(db_engine: Engine) -> None:
+    # The routes tests replace the AsyncSession, this runs the async CRUD
+    # methods on a real one
+    async def read_poem() -> tuple[Optional[PoemSchema], Optional[PoemSchema]]:
+        async_engine = create_async_engine(str(settings.SQLALCHEMY_TEST_DATABASE_URI))
+        try:
+            async with async_engine.connect() as connection:
+                await connection.begin()
+                session = AsyncSession(connection)
+                poem = await session.run_sync(create_random_poem)
+                read = await poem_crud.get_by_id_async(session, poem.id)
+                random = await poem_crud.get_random_async(session)
+                await connection.rollback()
+        finally:
+            await async_engine.dispose()
+
+        return read, random
+
+    poem, random = asyncio.run(read_poem())
+    assert poem
+    assert random
+    assert poem.author_names == []
+
+
+def test_read_poems_query_count(
+    client: TestClient,
+    superuser_token_headers: dict[str, str],
+    db: Session,
+    assert_max_queries: Callable[[Response, int], None],
+) -> None:
+    def create_poems(number: int) -> None:
+        for _ in range(number):
+            author = create_random_author(db)
+            poem = create_random_poem(db, author_names=[author.full_name])
+            create_random_derived_poem(db, poem.id, author_names=[author.full_name])
+            create_random_derived_poem(db, poem.id)
+
+    def read_poems() -> Response:
+        r = client.get(
+            f"{settings.API_V1_STR}/poems/",
+            headers=superuser_token_headers,
+            params={"limit": 100},
+        )
+        assert r.status_code == 200
+        return r
+
+    # The first request also loads the user
+    read_poems()
+    create_poems(2)
+    few = read_poems()
+    create_poems(10)
+    many = read_poems()
+
+    assert many.headers["X-Query-Count"] == few.headers["X-Query-Count"]
+    assert_max_queries(many, 5)
+
+
+def test_read_poem_query_count(
+    client: TestClient,
+    normal_user_token_headers: dict[str, str],
+    db: Session,
+    assert_max_queries: Callable[[Response, int], None],
+) -> None:
+    author = create_random_author(db)
+    poem = create_random_poem(db, author_names=[author.full_name])
+    for _ in range(3):
+        create_random_derived_poem(db, poem.id, author_names=[author.full_name])
+
+    client.get(f"{settings.API_V1_STR}/poems/random", headers=normal_user_token_headers)
+    # Requests share the test session, start it empty as it would be
+    db.expunge_all()
+    r = client.get(
+        f"{settings.API_V1_STR}/poems/{poem.id}", headers=normal_user_token_headers
+    )
+    assert r.status_code == 200
+    assert_max_queries(r, 5)
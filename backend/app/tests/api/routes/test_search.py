@@ -1,19 +1,27 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable
+
 from fastapi.testclient import TestClient
+from httpx import Response
 from sqlalchemy.orm import Session
+from app.api.deps import get_async_session_factory
 from app.core.config import settings
+from app.core.security import get_password_hash
+from app.main import app
 from app.crud.author import author_crud
 from app.crud.poem import poem_crud
 from app.crud.user import user_crud
 from app.crud.collection import collection_crud
 from app.schemas.user import UserCreate
 from app.schemas.author import AuthorCreate
-from app.schemas.poem import PoemCreate
+from app.schemas.poem import PoemCreate, PoemType, PoemUpdate
 from app.schemas.collection import CollectionCreate
 from app.tests.utils.author import create_random_author
 from app.tests.utils.collection import create_random_collection
 from app.tests.utils.user import create_random_user
 from app.tests.utils.utils import random_email, random_lower_string
-from app.tests.utils.poem import create_random_poem
+from app.tests.utils.poem import create_random_poem, create_random_derived_poem
 
 
 def test_search_as_admin(
@@ -21,11 +29,11 @@ def test_search_as_admin(
 ) -> None:
     query = "test"
 
+    password = random_lower_string()
     user = user_crud.create(
         db,
-        UserCreate(
-            username="testuser", email=random_email(), password=random_lower_string()
-        ),
+        UserCreate(username="testuser", email=random_email(), password=password),
+        hashed_password=get_password_hash(password),
     )
     user2 = create_random_user(db)
 
@@ -76,11 +84,11 @@ def test_search_as_normal_user(
 ) -> None:
     query = "test"
 
+    password = random_lower_string()
     user = user_crud.create(
         db,
-        UserCreate(
-            username="testuser", email=random_email(), password=random_lower_string()
-        ),
+        UserCreate(username="testuser", email=random_email(), password=password),
+        hashed_password=get_password_hash(password),
     )
     user2 = create_random_user(db)
 
@@ -125,3 +133,285 @@ def test_search_as_normal_user(
     assert len(search_result["collections"]) == 1
     assert search_result["collections"][0]["id"] == str(collection.id) # type: ignore
     assert search_result["collections"][0]["name"] == collection.name # type: ignore
+
+
+def test_search_poems_by_verses(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    title = random_lower_string()
+    short = poem_crud.create(db, PoemCreate(title=title, content="a\nb"))
+    long = poem_crud.create(db, PoemCreate(title=title, content="a\nb\nc\nd"))
+
+    r = client.post(
+        f"{settings.API_V1_STR}/search",
+        headers=superuser_token_headers,
+        json={
+            "search_type": ["poem"],
+            "poem_params": {"poem_title": title, "poem_verses": ">2"},
+        },
+    )
+
+    assert r.status_code == 200
+    poem_ids = [poem["id"] for poem in r.json()["poems"]]
+    assert poem_ids == [str(long.id)]  # type: ignore
+
+    poem_crud.update(db, short.id, PoemUpdate(content="a\nb\nc"))  # type: ignore
+    r = client.post(
+        f"{settings.API_V1_STR}/search",
+        headers=superuser_token_headers,
+        json={
+            "search_type": ["poem"],
+            "poem_params": {"poem_title": title, "poem_verses": "3"},
+        },
+    )
+
+    assert r.status_code == 200
+    poem_ids = [poem["id"] for poem in r.json()["poems"]]
+    assert poem_ids == [str(short.id)]  # type: ignore
+
+
+def test_search_poems_combined_filters(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    author = create_random_author(db)
+    original = create_random_poem(db, author_names=[author.full_name])
+    translation = create_random_derived_poem(
+        db, original.id, author_names=[author.full_name]
+    )
+    create_random_derived_poem(db, original.id, type=PoemType.VERSION.value)
+
+    for poem_type, expected in [("original", original), ("translation", translation)]:
+        r = client.post(
+            f"{settings.API_V1_STR}/search",
+            headers=superuser_token_headers,
+            json={
+                "search_type": ["poem"],
+                "poem_params": {"poem_author": author.full_name, "poem_type": poem_type},
+            },
+        )
+
+        assert r.status_code == 200
+        poem_ids = [poem["id"] for poem in r.json()["poems"]]
+        assert poem_ids == [str(expected.id)]
+
+
+def test_search_poems_count(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    title = random_lower_string()
+    for _ in range(3):
+        poem_crud.create(db, PoemCreate(title=title, content="a"))
+
+    for skip, expected_len in [(0, 2), (2, 1), (5, 0)]:
+        r = client.post(
+            f"{settings.API_V1_STR}/search",
+            headers=superuser_token_headers,
+            json={
+                "search_type": ["poem"],
+                "poem_params": {
+                    "poem_title": title,
+                    "poem_basic": False,
+                    "poem_skip": skip,
+                    "poem_limit": 2,
+                },
+            },
+        )
+
+        assert r.status_code == 200
+        result = r.json()["poems"]
+        assert result["count"] == 3
+        assert len(result["data"]) == expected_len
+
+
+def test_search_poems_full_text(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    word = random_lower_string()
+    poem = poem_crud.create(
+        db,
+        PoemCreate(
+            title=random_lower_string(),
+            content=f"Los barcos navegaban\npor el mar {word}",
+            language="Español",
+        ),
+    )
+    other = poem_crud.create(
+        db, PoemCreate(title=f"{word} {word}", content="Otro poema", language="es")
+    )
+
+    r = client.post(
+        f"{settings.API_V1_STR}/search",
+        headers=superuser_token_headers,
+        json={
+            "search_type": ["poem"],
+            "poem_params": {"poem_query": f"barco {word}"},
+        },
+    )
+    assert r.status_code == 200
+    assert [p["id"] for p in r.json()["poems"]] == [str(poem.id)]  # type: ignore
+
+    r = client.post(
+        f"{settings.API_V1_STR}/search",
+        headers=superuser_token_headers,
+        json={
+            "search_type": ["poem"],
+            "poem_params": {"poem_query": word, "poem_order_by": "rank"},
+        },
+    )
+    assert r.status_code == 200
+    poem_ids = [p["id"] for p in r.json()["poems"]]
+    assert poem_ids == [str(poem.id), str(other.id)]  # type: ignore
+
+    r = client.post(
+        f"{settings.API_V1_STR}/search",
+        headers=superuser_token_headers,
+        json={
+            "search_type": ["poem"],
+            "poem_params": {
+                "poem_query": word,
+                "poem_order_by": "rank",
+                "poem_desc": True,
+            },
+        },
+    )
+    assert r.status_code == 200
+    poem_ids = [p["id"] for p in r.json()["poems"]]
+    assert poem_ids == [str(other.id), str(poem.id)]  # type: ignore
+
+
+def test_search_poems_rank_without_query(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    r = client.post(
+        f"{settings.API_V1_STR}/search",
+        headers=superuser_token_headers,
+        json={"search_type": ["poem"], "poem_params": {"poem_order_by": "rank"}},
+    )
+    assert r.status_code == 422
+
+
+def test_search_authors_fuzzy(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    author = author_crud.create(db, AuthorCreate(full_name="José de Espronceda"))
+    author_crud.create(db, AuthorCreate(full_name="José Zorrilla"))
+
+    params = {"author_full_name": "Esproncda", "author_basic": False}
+    r = client.post(
+        f"{settings.API_V1_STR}/search",
+        headers=superuser_token_headers,
+        json={"search_type": ["author"], "author_params": params},
+    )
+    assert r.status_code == 200
+    assert r.json()["authors"]["count"] == 0
+
+    params["author_fuzzy"] = True  # type: ignore
+    r = client.post(
+        f"{settings.API_V1_STR}/search",
+        headers=superuser_token_headers,
+        json={"search_type": ["author"], "author_params": params},
+    )
+    assert r.status_code == 200
+    result = r.json()["authors"]
+    assert result["data"][0]["id"] == str(author.id)
+    assert result["next_cursor"] is None
+
+
+def test_search_runs_concurrently(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    running = 0
+    most_running = 0
+
+    class SlowSession:
+        async def run_sync(self, fn: Callable[..., Any], *args: Any) -> Any:
+            nonlocal running, most_running
+            running += 1
+            most_running = max(most_running, running)
+            await asyncio.sleep(0.05)
+            running -= 1
+            return fn(db, *args)
+
+    @asynccontextmanager
+    async def slow_session() -> AsyncIterator[SlowSession]:
+        yield SlowSession()
+
+    app.dependency_overrides[get_async_session_factory] = lambda: slow_session
+    poem = create_random_poem(db)
+
+    r = client.post(
+        f"{settings.API_V1_STR}/search",
+        headers=superuser_token_headers,
+        json={
+            "search_type": ["author", "user", "poem", "collection"],
+            "poem_params": {"poem_title": poem.title},
+        },
+    )
+
+    assert r.status_code == 200
+    assert most_running == 4
+    assert [p["id"] for p in r.json()["poems"]] == [str(poem.id)]
+
+
+def test_search_query_count(
+    client: TestClient,
+    superuser_token_headers: dict[str, str],
+    db: Session,
+    assert_max_queries: Callable[[Response, int], None],
+) -> None:
+    author = create_random_author(db)
+    for _ in range(5):
+        create_random_poem(db, author_names=[author.full_name])
+
+    client.get(f"{settings.API_V1_STR}/poems/random", headers=superuser_token_headers)
+    db.expunge_all()
+    r = client.post(
+        f"{settings.API_V1_STR}/search",
+        headers=superuser_token_headers,
+        json={
+            "search_type": ["author", "user", "poem", "collection"],
+            "poem_params": {"poem_author": author.full_name, "poem_basic": False},
+        },
+    )
+
+    assert r.status_code == 200
+    assert r.json()["poems"]["count"] == 5
+    assert_max_queries(r, 10)
+
+
+def test_search_basic_query_count(
+    client: TestClient,
+    normal_user_token_headers: dict[str, str],
+    db: Session,
+    assert_max_queries: Callable[[Response, int], None],
+) -> None:
+    author = create_random_author(db)
+    poem = create_random_poem(db, author_names=[author.full_name])
+    hidden = poem_crud.create(
+        db,
+        PoemCreate(
+            title=poem.title + " hidden",
+            content="aaaa",
+            show_author=False,
+            author_names=[author.full_name],
+        ),
+    )
+    assert hidden
+
+    client.get(f"{settings.API_V1_STR}/poems/random", headers=normal_user_token_headers)
+    db.expunge_all()
+    r = client.post(
+        f"{settings.API_V1_STR}/search",
+        headers=normal_user_token_headers,
+        json={
+            "search_type": ["author", "user", "poem", "collection"],
+            "poem_params": {"poem_title": poem.title},
+        },
+    )
+
+    assert r.status_code == 200
+    poems = {p["id"]: p for p in r.json()["poems"]}
+    assert poems[str(poem.id)]["author_names"] == [author.full_name]
+    assert poems[str(hidden.id)]["author_names"] == []
+    # A single query per entity, however many rows it returns
+    assert_max_queries(r, 4)
@@ -1,15 +1,17 @@
 import uuid
 from unittest.mock import patch
 
+import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 
 from app.crud.user import user_crud
 from app.core.config import settings
-from app.core.security import verify_password
+from app.core.password_hasher import password_hasher
+from app.core.security import get_password_hash, verify_password
 from app.schemas.user import UserCreate
 from app.tests.utils.utils import random_email, random_lower_string
-from app.tests.utils.user import create_random_user
+from app.tests.utils.user import create_random_user, user_authentication_headers
 
 
 def test_get_users_superuser_me(
@@ -81,7 +83,9 @@ def test_get_existing_user_current_user(client: TestClient, db: Session) -> None
     password = random_lower_string()
     username = random_lower_string()
     user_in = UserCreate(email=email, password=password, username=username)
-    user = user_crud.create(db=db, obj_create=user_in)
+    user = user_crud.create(
+        db=db, obj_create=user_in, hashed_password=get_password_hash(password)
+    )
     user_id = user.id
 
     login_data = {
@@ -314,6 +318,54 @@ def test_update_user(
     assert user_db.full_name == "Updated_full_name"
 
 
+def test_update_user_password(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    user = create_random_user(db)
+    password = random_lower_string()
+    before = password_hasher.stats()
+
+    r = client.patch(
+        f"{settings.API_V1_STR}/users/{user.id}",
+        headers=superuser_token_headers,
+        json={"password": password},
+    )
+    assert r.status_code == 200
+    assert password_hasher.stats()["completed"] == before["completed"] + 1
+
+    user_db = user_crud.get_by_id(db, user.id)
+    assert user_db
+    assert verify_password(password, user_db.hashed_password)
+
+
+def test_create_and_update_user_hasher_busy(
+    client: TestClient,
+    superuser_token_headers: dict[str, str],
+    db: Session,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    user = create_random_user(db)
+    monkeypatch.setattr(password_hasher, "max_pending", 0)
+
+    data = {
+        "email": random_email(),
+        "password": random_lower_string(),
+        "username": random_lower_string(),
+    }
+    r = client.post(
+        f"{settings.API_V1_STR}/users/", headers=superuser_token_headers, json=data
+    )
+    assert r.status_code == 503
+    assert user_crud.get_by_email(db, data["email"]) is None
+
+    r = client.patch(
+        f"{settings.API_V1_STR}/users/{user.id}",
+        headers=superuser_token_headers,
+        json={"password": random_lower_string()},
+    )
+    assert r.status_code == 503
+
+
 def test_update_user_not_exists(
     client: TestClient, superuser_token_headers: dict[str, str]
 ) -> None:
@@ -348,7 +400,9 @@ def test_delete_user_me(client: TestClient, db: Session) -> None:
     password = random_lower_string()
     username = random_lower_string()
     user_in = UserCreate(email=email, password=password, username=username)
-    user = user_crud.create(db=db, obj_create=user_in)
+    user = user_crud.create(
+        db=db, obj_create=user_in, hashed_password=get_password_hash(password)
+    )
     user_id = user.id
 
     login_data = {
@@ -530,3 +584,30 @@ def test_create_user_existing_email(
     assert (
         r.json()["detail"] == "The user with this email already exists in the system."
     )
+
+
+def test_updated_user_permissions_apply_right_away(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    email = random_email()
+    password = random_lower_string()
+    user_in = UserCreate(
+        email=email, password=password, username=random_lower_string(), is_verified=True
+    )
+    user = user_crud.create(
+        db=db, obj_create=user_in, hashed_password=get_password_hash(password)
+    )
+    headers = user_authentication_headers(client=client, email=email, password=password)
+
+    r = client.get(f"{settings.API_V1_STR}/users/", headers=headers)
+    assert r.status_code == 403
+
+    r = client.patch(
+        f"{settings.API_V1_STR}/users/{user.id}",
+        headers=superuser_token_headers,
+        json={"is_superuser": True},
+    )
+    assert r.status_code == 200
+
+    r = client.get(f"{settings.API_V1_STR}/users/", headers=headers)
+    assert r.status_code == 200
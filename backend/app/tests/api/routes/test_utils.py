@@ -0,0 +1,168 @@
+import json
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.db import engine, pool_stats
+from app.crud.poem import poem_crud
+from app.crud.user import user_crud
+from app.models.poem import Poem
+from app.tests.utils.utils import random_email, random_lower_string
+
+
+def test_metrics_db_pool(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    before = pool_stats()
+    with engine.connect():
+        r = client.get(
+            f"{settings.API_V1_STR}/utils/metrics/", headers=superuser_token_headers
+        )
+
+    assert r.status_code == 200
+    stats = r.json()["db_pool"]
+    assert stats["size"] == settings.DB_POOL_SIZE
+    assert stats["checked_out"] == before["checked_out"] + 1
+    assert stats["checkouts"] == before["checkouts"] + 1
+    assert stats["saturation"] > 0
+    assert stats["wait_max_ms"] >= stats["wait_p99_ms"] >= 0
+
+
+def test_metrics_superuser_only(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    r = client.get(
+        f"{settings.API_V1_STR}/utils/metrics/", headers=normal_user_token_headers
+    )
+    assert r.status_code == 403
+
+
+def test_import_data(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    author_name = random_lower_string()
+    user_id = uuid.uuid4()
+    poem_id = uuid.uuid4()
+    records = [
+        {"entity": "author", "full_name": author_name},
+        {
+            "entity": "user",
+            "id": str(user_id),
+            "email": random_email(),
+            "username": random_lower_string(),
+            "hashed_password": "hash",
+            "author_name": author_name,
+        },
+        {
+            "entity": "poem",
+            "id": str(poem_id),
+            "title": random_lower_string(),
+            "content": "verso\nverso",
+            "language": "es",
+            "author_names": [author_name],
+        },
+        {
+            "entity": "poem",
+            "title": random_lower_string(),
+            "content": "verso",
+            "original_poem_id": str(poem_id),
+            "type": 0,
+        },
+        {"entity": "poem", "title": "a", "content": "a", "author_names": ["nobody"]},
+        {
+            "entity": "collection",
+            "name": random_lower_string(),
+            "user_id": str(user_id),
+            "poem_ids": [str(poem_id)],
+        },
+    ]
+
+    r = client.post(
+        f"{settings.API_V1_STR}/utils/import/",
+        headers=superuser_token_headers,
+        params={"chunk_size": 2},
+        content="\n".join(json.dumps(record) for record in records),
+    )
+
+    assert r.status_code == 200
+    result = r.json()
+    assert result["skipped"] == 1
+    assert result["rows"] == {
+        "author": 1,
+        "user": 1,
+        "poem": 2,
+        "author_poem": 1,
+        "poem_poem": 1,
+        "collection": 1,
+        "collection_poem": 1,
+    }
+
+    poem = poem_crud.get_by_id(db, poem_id)
+    assert poem
+    assert poem.author_names == [author_name]
+    assert db.scalar(select(Poem.num_verses).where(Poem.id == poem_id)) == 2
+    assert db.scalar(select(Poem.content_html).where(Poem.id == poem_id))
+    assert len(poem.derived_poems) == 1
+    user = user_crud.get_by_id(db, user_id)
+    assert user
+    assert user.author_id is not None
+
+
+def test_import_data_derived_from_skipped_poem(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    original_id = uuid.uuid4()
+    derived_id = uuid.uuid4()
+    records = [
+        {
+            "entity": "poem",
+            "id": str(original_id),
+            "title": random_lower_string(),
+            "content": "verso",
+            "author_names": ["nobody"],
+        },
+        {
+            "entity": "poem",
+            "id": str(derived_id),
+            "title": random_lower_string(),
+            "content": "verso",
+            "original_poem_id": str(original_id),
+            "type": 0,
+        },
+        {
+            "entity": "poem",
+            "title": random_lower_string(),
+            "content": "verso",
+            "original_poem_id": str(derived_id),
+            "type": 1,
+        },
+    ]
+
+    r = client.post(
+        f"{settings.API_V1_STR}/utils/import/",
+        headers=superuser_token_headers,
+        content="\n".join(json.dumps(record) for record in records),
+    )
+
+    assert r.status_code == 200
+    result = r.json()
+    assert result["skipped"] == 3
+    assert result["rows"]["poem"] == 0
+    assert result["rows"]["poem_poem"] == 0
+    assert poem_crud.get_by_id(db, derived_id) is None
+
+
+def test_import_data_invalid_record(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    r = client.post(
+        f"{settings.API_V1_STR}/utils/import/",
+        headers=superuser_token_headers,
+        content='{"entity": "author", "full_name": "a"}\n{"entity": "poem"}',
+    )
+
+    assert r.status_code == 400
+    assert r.json()["detail"].startswith("Invalid record on line 2")
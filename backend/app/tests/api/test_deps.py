@@ -0,0 +1,41 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_db
+from app.core.config import settings
+from app.core.principal_cache import principal_cache
+from app.main import app
+from app.tests.utils.author import create_random_author
+from app.tests.utils.collection import create_random_collection
+from app.tests.utils.poem import create_random_poem
+from app.tests.utils.user import create_random_user
+
+
+def no_sync_session() -> None:
+    raise AssertionError("The sync session was used")
+
+
+def test_async_routes_authenticate_on_async_session(
+    client: TestClient,
+    normal_user_token_headers: dict[str, str],
+    db: Session,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    poem = create_random_poem(db)
+    author = create_random_author(db)
+    collection = create_random_collection(db, create_random_user(db).id)
+    monkeypatch.setitem(app.dependency_overrides, get_db, no_sync_session)
+
+    requests = [
+        ("GET", f"{settings.API_V1_STR}/poems/{poem.id}", None),  # type: ignore
+        ("GET", f"{settings.API_V1_STR}/poems/random", None),
+        ("GET", f"{settings.API_V1_STR}/authors/{author.id}", None),
+        ("GET", f"{settings.API_V1_STR}/collections/{collection.id}", None),  # type: ignore
+        ("POST", f"{settings.API_V1_STR}/search", {"search_type": ["poem"]}),
+    ]
+    for method, url, body in requests:
+        # Looked up in the database rather than found in the cache
+        principal_cache.clear()
+        r = client.request(method, url, headers=normal_user_token_headers, json=body)
+        assert r.status_code == 200, url
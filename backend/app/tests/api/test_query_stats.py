@@ -0,0 +1,21 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from app.core.db import engine
+from app.core.query_stats import count_queries
+
+
+def test_count_queries_after_failed_statement() -> None:
+    with engine.connect() as conn, count_queries() as stats:
+        for _ in range(3):
+            with pytest.raises(DBAPIError):
+                conn.execute(text("SELECT 1 / 0"))
+            conn.rollback()
+
+        conn.execute(text("SELECT 1"))
+        info = dict(conn.info)
+
+    assert stats.count == 1
+    assert stats.seconds > 0
+    assert not info
@@ -0,0 +1,105 @@
+import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute, request_response
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.responses import FastJSONResponse
+from app.crud.collection import collection_crud
+from app.crud.poem import poem_crud
+from app.main import app
+from app.schemas.collection import CollectionCreate
+from app.schemas.poem import PoemCreate
+from app.tests.utils.author import create_random_author
+from app.tests.utils.poem import create_random_derived_poem
+from app.tests.utils.user import create_random_user
+from app.tests.utils.utils import random_lower_string
+
+
+def test_fast_json_response_matches_json_response() -> None:
+    content = {
+        "id": uuid.uuid4(),
+        "created_at": datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc),
+        "updated_at": datetime(2024, 5, 1, 12, 30),
+        "title": "Canción del pirata ñ “€” 🌊",
+        "verses": [1, 2.5, -3, None, True],
+        "nested": {"empty": [], "none": None},
+    }
+
+    fast = FastJSONResponse(content).body
+    assert fast == JSONResponse(jsonable_encoder(content)).body
+
+
+def test_default_response_class() -> None:
+    assert app.router.default_response_class is FastJSONResponse
+
+
+@contextmanager
+def json_response_routes() -> Iterator[None]:
+    # The routes as they were before orjson, their handlers are built with
+    # the response class when they are created
+    routes = [route for route in app.routes if isinstance(route, APIRoute)]
+    classes = [route.response_class for route in routes]
+    try:
+        for route in routes:
+            route.response_class = JSONResponse
+            route.app = request_response(route.get_route_handler())
+        yield
+    finally:
+        for route, response_class in zip(routes, classes):
+            route.response_class = response_class
+            route.app = request_response(route.get_route_handler())
+
+
+def test_large_payloads_match_json_response(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    author = create_random_author(db)
+    poems = [
+        poem_crud.create(
+            db,
+            PoemCreate(
+                title=f"Poema {i} {random_lower_string()}",
+                content="Con diez cañones por banda,\n“viento en popa” a toda vela 🌊",
+                description="Canción del pirata ñ “€”",
+                language="es",
+                author_names=[author.full_name],
+            ),
+        )
+        for i in range(20)
+    ]
+    derived = create_random_derived_poem(
+        db, original_id=poems[0].id, author_names=[author.full_name]  # type: ignore
+    )
+    collection = collection_crud.create(
+        db,
+        CollectionCreate(
+            name=random_lower_string(),
+            user_id=create_random_user(db).id,
+            poem_ids=[poem.id for poem in poems if poem],
+        ),
+    )
+    assert collection
+
+    # Every route answering these through the default response class
+    urls = [
+        f"{settings.API_V1_STR}/collections/{collection.id}",
+        f"{settings.API_V1_STR}/poems/{poems[0].id}",  # type: ignore
+        f"{settings.API_V1_STR}/poems/{derived.id}",
+        f"{settings.API_V1_STR}/authors/{author.id}",
+        f"{settings.API_V1_STR}/users/me",
+    ]
+    responses = [client.get(url, headers=superuser_token_headers) for url in urls]
+    with json_response_routes():
+        expected = [client.get(url, headers=superuser_token_headers) for url in urls]
+
+    for r, before in zip(responses, expected):
+        assert r.status_code == 200
+        assert r.headers["content-type"] == "application/json"
+        assert r.content == before.content
@@ -1,15 +1,22 @@
 from collections.abc import Generator
+from concurrent.futures import Executor, Future
+from contextlib import nullcontext
+from typing import Any, Callable
 
 import pytest
 from fastapi.testclient import TestClient
+from httpx import Response
 from sqlalchemy import Engine, create_engine
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
 from app.core.base_class import Base
 from app.core.db import init_db
+from app.core.query_stats import track_queries
 from app.main import app
-from app.api.deps import get_db
+from app.api.deps import get_async_db, get_async_session_factory, get_db
+from app.render_queue import render_queue
+from app.core.principal_cache import principal_cache
 from app.schemas.author import AuthorSchema
 from app.tests.utils.author import get_author_user, get_user_author
 from app.tests.utils.user import (
@@ -21,6 +28,7 @@ from app.tests.utils.user import (
 @pytest.fixture(scope="session", autouse=True)
 def db_engine() -> Generator[Engine, None, None]:
     engine = create_engine(str(settings.SQLALCHEMY_TEST_DATABASE_URI))
+    track_queries(engine)
 
     Base.metadata.create_all(engine)
 
@@ -43,9 +51,48 @@ def db(db_engine: Session) -> Generator[Session, None, None]:
         db_session.rollback()
 
 
+class InlineExecutor(Executor):
+    def submit(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future[Any]:
+        future: Future[Any] = Future()
+        future.set_result(fn(*args, **kwargs))
+        return future
+
+
+@pytest.fixture(autouse=True)
+def inline_render_queue(db: Session, monkeypatch: pytest.MonkeyPatch) -> None:
+    # Render jobs run right away through the test session, so they see the
+    # poems of the test and are rolled back with them
+    monkeypatch.setattr(render_queue, "executor", InlineExecutor())
+    monkeypatch.setattr(render_queue, "session_factory", lambda: nullcontext(db))
+
+
+@pytest.fixture(autouse=True)
+def clear_principal_cache() -> Generator[None, None, None]:
+    # Users cached by one test may not exist after its rollback
+    yield
+    principal_cache.clear()
+
+
+class TestAsyncSession:
+    """
+    Stands in for the AsyncSession of the async routes, which only query
+    through run_sync, so they use the test session and its transaction.
+    """
+
+    def __init__(self, session: Session) -> None:
+        self.session = session
+
+    async def run_sync(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        return fn(self.session, *args, **kwargs)
+
+
 @pytest.fixture()
 def client(db: Session) -> Generator[TestClient, None, None]:
     app.dependency_overrides[get_db] = lambda: db
+    app.dependency_overrides[get_async_db] = lambda: TestAsyncSession(db)
+    app.dependency_overrides[get_async_session_factory] = lambda: (
+        lambda: nullcontext(TestAsyncSession(db))
+    )
 
     client = TestClient(app)
     yield client
@@ -53,6 +100,16 @@ def client(db: Session) -> Generator[TestClient, None, None]:
     app.dependency_overrides.clear()
 
 
+@pytest.fixture()
+def assert_max_queries() -> Callable[[Response, int], None]:
+    # Counted by the X-Query-Count middleware of app.main
+    def _assert_max_queries(response: Response, limit: int) -> None:
+        count = int(response.headers["X-Query-Count"])
+        assert count <= limit, f"{count} queries, expected at most {limit}"
+
+    return _assert_max_queries
+
+
 @pytest.fixture()
 def superuser_token_headers(client: TestClient) -> dict[str, str]:
     return get_superuser_token_headers(client)
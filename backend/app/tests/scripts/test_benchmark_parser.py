@@ -0,0 +1,36 @@
+from app.benchmark_parser import (
+    benchmark_cases,
+    find_regressions,
+    find_superlinear,
+    run_case,
+)
+
+
+def test_benchmark_cases_render() -> None:
+    for content in benchmark_cases().values():
+        result = run_case(content, min_rounds=1, min_time=0)
+        assert result["ops_per_sec"] > 0
+        assert result["p99_ms"] > 0
+
+
+def test_find_regressions() -> None:
+    baseline = {"typical": {"ops_per_sec": 100.0, "p99_ms": 1.0}}
+
+    slower = {"typical": {"ops_per_sec": 50.0, "p99_ms": 2.0}}
+    assert len(find_regressions(slower, baseline, tolerance=0.3)) == 1
+
+    similar = {"typical": {"ops_per_sec": 80.0, "p99_ms": 1.2}}
+    assert find_regressions(similar, baseline, tolerance=0.3) == []
+
+    new_case = {"long": {"ops_per_sec": 1.0, "p99_ms": 1000.0}}
+    assert find_regressions(new_case, baseline, tolerance=0.3) == []
+
+
+def test_find_superlinear() -> None:
+    small = {"long": {"ops_per_sec": 100.0, "p99_ms": 10.0}}
+
+    linear = {"long": {"ops_per_sec": 25.0, "p99_ms": 40.0}}
+    assert find_superlinear(small, linear, factor=4) == []
+
+    quadratic = {"long": {"ops_per_sec": 6.25, "p99_ms": 160.0}}
+    assert len(find_superlinear(small, quadratic, factor=4)) == 1
@@ -0,0 +1,14 @@
+from app.benchmark_password_hash import current_profile, profiles, run_profile
+from app.core.config import settings
+
+
+def test_profiles_include_current() -> None:
+    contexts = profiles([settings.PASSWORD_BCRYPT_ROUNDS], [])
+    assert current_profile() in contexts
+
+
+def test_run_profile() -> None:
+    context = profiles([4], [])["bcrypt rounds=4"]
+    result = run_profile(context, rounds=3)
+    assert result["mean_ms"] > 0
+    assert result["p99_ms"] >= result["mean_ms"]
@@ -0,0 +1,27 @@
+import asyncio
+import json
+
+from app.benchmark_serialization import (
+    ENDPOINTS,
+    run_endpoint,
+    sample_rows,
+    serialize_once,
+    serialize_twice,
+)
+
+
+def test_serialize_once_matches_response_model() -> None:
+    rows = sample_rows(size=8)
+    loop = asyncio.new_event_loop()
+    try:
+        for name, (schema, dto, page) in ENDPOINTS.items():
+            twice = serialize_twice(rows[name], schema, dto, page, loop)
+            assert json.loads(serialize_once(rows[name], dto, page)) == json.loads(twice)
+    finally:
+        loop.close()
+
+
+def test_run_endpoint() -> None:
+    result = run_endpoint("poems", sample_rows(size=8)["poems"], rounds=2)
+    assert result["before_ms"] > 0
+    assert result["after_ms"] > 0
@@ -1,4 +1,8 @@
-from app.poem_parser import PoemParser
+import re
+
+import pytest
+
+from app.poem_parser import PoemParser, RenderTimeout
 
 def test_parser_cesura() -> None: 
     input_text = """De los sos ojos//tan fuertemientre llorando,
@@ -73,3 +77,53 @@ no corta el mar, sino vuela
 
     poem_parser = PoemParser(input_text)
     assert poem_parser.to_html() == output_text
+
+
+def test_parser_marks() -> None:
+    input_text = """Con diez =cañones= por banda,
+viento en =popa=(yellow) a toda =vela=,
+no corta el mar, sino =vuela="""
+
+    output_text = '<div style="text-align: center;">Con diez <mark>cañones</mark> por banda,<br>viento en <mark style="background-color:yellow!important;">popa</mark> a toda <mark>vela</mark>,<br>no corta el mar, sino <mark>vuela</mark></div>'
+
+    poem_parser = PoemParser(input_text)
+    assert poem_parser.to_html() == output_text
+
+
+def test_parser_marks_repeated_text() -> None:
+    # Highlights used to be rendered with str.replace, which also replaces
+    # the same text where it was escaped or where it is part of another
+    # highlight, and the output must not change.
+    def render_marks(poem: str) -> str:
+        for match in re.finditer(r"(?<!\\)=([^=]+)=(?:\(([^)]+)\))?", poem):
+            if match.group(2):
+                html = f'<mark style="background-color:{match.group(2)}!important;">{match.group(1)}</mark>'
+            else:
+                html = f"<mark>{match.group(1)}</mark>"
+            poem = poem.replace(match.group(0), html)
+
+        return poem
+
+    for input_text in [
+        "=a= \\=a=",
+        "=a= =a=(red)",
+        "=a=(red) =a=",
+        "=a=(b=c) =c=",
+        "=a=b=c= =b=",
+        "=a=(red)=b=(red)=a=(red)",
+        "=x=(red) =y= =x=",
+        "=a=(" * 10,
+    ]:
+        assert PoemParser(input_text)._parse_marks(input_text) == render_marks(input_text)
+
+
+def test_parser_timeout() -> None:
+    input_text = """Con diez **cañones** por banda,
+viento en popa a toda <vela>(20)"""
+
+    output_text = '<div style="text-align: center;">Con diez **cañones** por banda,<br>viento en popa a toda &lt;vela&gt;(20)</div>'
+
+    poem_parser = PoemParser(input_text, timeout=0)
+    with pytest.raises(RenderTimeout):
+        poem_parser.render()
+    assert poem_parser.to_html() == output_text
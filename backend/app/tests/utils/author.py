@@ -4,6 +4,7 @@ from app.crud.author import author_crud
 from app.schemas.user import UserCreate, UserUpdate, UserSchema
 from app.crud.user import user_crud
 from app.core.config import settings
+from app.core.security import get_password_hash
 
 from app.tests.utils.utils import random_lower_string
 
@@ -23,10 +24,15 @@ def get_user_author(db: Session) -> UserSchema:
     user = user_crud.get_by_email(db, email=email)
 
     if not user:
+        password = random_lower_string()
         user_in_create = UserCreate(
-            email=email, password=random_lower_string(), username=random_lower_string()
+            email=email, password=password, username=random_lower_string()
+        )
+        user = user_crud.create(
+            db=db,
+            obj_create=user_in_create,
+            hashed_password=get_password_hash(password),
         )
-        user = user_crud.create(db=db, obj_create=user_in_create)
 
     if user.author_id is None:
         author = create_random_author(db)
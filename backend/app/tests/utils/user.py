@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 
 from app.crud.user import user_crud
 from app.core.config import settings
+from app.core.security import get_password_hash
 from app.schemas.user import UserCreate, UserUpdate, UserSchema
 from app.tests.utils.utils import random_email, random_lower_string
 
@@ -25,7 +26,9 @@ def create_random_user(db: Session) -> UserSchema:
     username = random_lower_string()
 
     user_in = UserCreate(email=email, password=password, username=username)
-    user = user_crud.create(db=db, obj_create=user_in)
+    user = user_crud.create(
+        db=db, obj_create=user_in, hashed_password=get_password_hash(password)
+    )
     return user
 
 
@@ -42,12 +45,21 @@ def authentication_token_from_email(
     user = user_crud.get_by_email(db, email=email)
     if not user:
         user_in_create = UserCreate(email=email, password=password, username=username)
-        user = user_crud.create(db=db, obj_create=user_in_create)
+        user = user_crud.create(
+            db=db,
+            obj_create=user_in_create,
+            hashed_password=get_password_hash(password),
+        )
     else:
         user_in_update = UserUpdate(password=password)
         if not user.id:
             raise Exception("User id not set")
-        user = user_crud.update(db=db, obj_id=user.id, obj_update=user_in_update)
+        user = user_crud.update(
+            db=db,
+            obj_id=user.id,
+            obj_update=user_in_update,
+            hashed_password=get_password_hash(password),
+        )
 
     return user_authentication_headers(client=client, email=email, password=password)
 
@@ -7,4 +7,7 @@ set -x
 python app/backend_pre_start.py
 
 # Create initial data in DB
-python app/initial_data.py
\ No newline at end of file
+python app/initial_data.py
+
+# Bring existing rows up to date with new columns
+python app/backfill_data.py
\ No newline at end of file
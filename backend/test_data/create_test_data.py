@@ -13,6 +13,7 @@ from app.schemas.poem import PoemCreate
 from app.schemas.collection import CollectionCreate
 
 from app.core.db import engine
+from app.core.security import get_password_hash
 
 
 def create_test_data(db: Session):
@@ -32,7 +33,13 @@ def create_test_data(db: Session):
     # Create users
     for user in tqdm(user_data, desc="Creating users"):
         user_in = UserCreate(**user)
-        users.append(user_crud.create(db, obj_create=user_in))
+        users.append(
+            user_crud.create(
+                db,
+                obj_create=user_in,
+                hashed_password=get_password_hash(user_in.password),
+            )
+        )
 
     print()
     authors = []